@@ -1,33 +1,27 @@
-import pandas as pd
-import json
+from openpyxl import load_workbook
 
 # Check the Excel file structure
 try:
-    # Try to read the Excel file with different approaches
+    # Read-only mode streams the sheet XML, so only a few rows are ever held in memory
     print("Checking Excel file structure...")
-    
-    # Method 1: Read all sheets
+    wb = load_workbook("Portfolio Data_Hypothetical.xlsx", read_only=True, data_only=True)
     try:
-        excel_data = pd.read_excel("Portfolio Data_Hypothetical.xlsx", sheet_name=None)
-        print(f"Found {len(excel_data)} sheets:")
-        for sheet_name, df in excel_data.items():
-            print(f"  Sheet '{sheet_name}': {df.shape}")
-            print(f"  Columns: {df.columns.tolist()}")
+        print(f"Found {len(wb.sheetnames)} sheets:")
+        for sheet_name in wb.sheetnames:
+            ws = wb[sheet_name]
+            print(f"  Sheet '{sheet_name}': ({ws.max_row}, {ws.max_column})")
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, None)
+            print(f"  Columns: {list(header) if header else []}")
             print(f"  First few rows:")
-            print(df.head())
+            for _ in range(5):
+                row = next(rows, None)
+                if row is None:
+                    break
+                print(f"  {row}")
             print("-" * 50)
-    except Exception as e:
-        print(f"Method 1 failed: {e}")
-    
-    # Method 2: Read default sheet
-    try:
-        df = pd.read_excel("Portfolio Data_Hypothetical.xlsx")
-        print(f"\nDefault sheet shape: {df.shape}")
-        print(f"Columns: {df.columns.tolist()}")
-        print(f"Sample data:")
-        print(df.head())
-    except Exception as e:
-        print(f"Method 2 failed: {e}")
-        
+    finally:
+        wb.close()
+
 except Exception as e:
-    print(f"Could not read Excel file: {e}")
\ No newline at end of file
+    print(f"Could not read Excel file: {e}")
@@ -1,19 +1,53 @@
 import os
+import re
 import time
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urljoin, urlparse
+from lxml import html as lx
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select, WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service as ChromeService
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+from download_hdfc_monthly_json import (PART_SUFFIX, SESSION, filter_files,
+                                        find_month_portfolio_content, probe, read_etag,
+                                        remove_stale_parts, save_etag,
+                                        stream_to_file, warm_up)
 
 # ----- Config -----
 TARGET_FOLDER = r"F:\MF Holdings"   # destination folder
 PAGE_URL = "https://www.hdfcfund.com/statutory-disclosure/portfolio/monthly-portfolio"
 HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
                          "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"}
+MAX_DOWNLOAD_WORKERS = 8
+
+# guards the pick-a-free-filename step when downloads run in parallel
+_PATH_LOCK = threading.Lock()
+
+# normalize month input to full name (e.g., 'January')
+_MONTH_MAP = {
+    '1': 'January', '01': 'January', 'jan': 'January', 'january': 'January',
+    '2': 'February', '02': 'February', 'feb': 'February', 'february': 'February',
+    '3': 'March', '03': 'March', 'mar': 'March', 'march': 'March',
+    '4': 'April', '04': 'April', 'apr': 'April', 'april': 'April',
+    '5': 'May', '05': 'May',
+    '6': 'June', '06': 'June', 'jun': 'June', 'june': 'June',
+    '7': 'July', '07': 'July', 'jul': 'July', 'july': 'July',
+    '8': 'August', '08': 'August', 'aug': 'August', 'august': 'August',
+    '9': 'September', '09': 'September', 'sep': 'September', 'september': 'September',
+    '10': 'October', 'oct': 'October', 'october': 'October',
+    '11': 'November', 'nov': 'November', 'november': 'November',
+    '12': 'December', 'dec': 'December', 'december': 'December'
+}
+# every <select>'s option texts in one WebDriver round-trip, in document order
+_SELECT_OPTIONS_JS = """
+return Array.from(document.querySelectorAll('select')).map(
+    s => Array.from(s.options).map(o => o.text.trim()));
+"""
+# URL in quotes inside an onclick handler
+_XLS_URL_RE = re.compile(r"(https?://[^\s'\"\\)]+\.xlsx?)")
 
 # ----- Helpers -----
 def ensure_folder(path):
@@ -22,23 +56,7 @@ def ensure_folder(path):
 def prompt_year_month():
     year = input("Enter year (e.g. 2024): ").strip()
     month_in = input("Enter month (name or number, e.g. Jan or 1 or January): ").strip()
-    # normalize month to full name (e.g., 'January')
-    month_map = {
-        '1': 'January', '01': 'January', 'jan': 'January', 'january': 'January',
-        '2': 'February', '02': 'February', 'feb': 'February', 'february': 'February',
-        '3': 'March', '03': 'March', 'mar': 'March', 'march': 'March',
-        '4': 'April', '04': 'April', 'apr': 'April', 'april': 'April',
-        '5': 'May', '05': 'May',
-        '6': 'June', '06': 'June', 'jun': 'June', 'june': 'June',
-        '7': 'July', '07': 'July', 'jul': 'July', 'july': 'July',
-        '8': 'August', '08': 'August', 'aug': 'August', 'august': 'August',
-        '9': 'September', '09': 'September', 'sep': 'September', 'september': 'September',
-        '10': 'October', 'oct': 'October', 'october': 'October',
-        '11': 'November', 'nov': 'November', 'november': 'November',
-        '12': 'December', 'dec': 'December', 'december': 'December'
-    }
-    key = month_in.strip().lower()
-    month = month_map.get(key, month_in)  # fallback to raw input if not mapped
+    month = _MONTH_MAP.get(month_in.lower(), month_in)  # fallback to raw input if not mapped
     return year, month
 
 def download_file(url, dest_folder, session=None):
@@ -48,25 +66,80 @@ def download_file(url, dest_folder, session=None):
     if not filename:
         filename = "downloaded.xlsx"
     out_path = os.path.join(dest_folder, filename)
-    # avoid overwriting: add suffix if exists
-    base, ext = os.path.splitext(out_path)
-    counter = 1
-    while os.path.exists(out_path):
-        out_path = f"{base}({counter}){ext}"
-        counter += 1
-    print(f"Downloading: {url} -> {out_path}")
-    with session.get(url, headers=HEADERS, stream=True, timeout=60) as r:
+    # skip the body transfer when the local copy is current (same size, or server answers 304)
+    if probe(url, out_path, session):
+        print(f"Up to date, skipping: {out_path}")
+        return out_path
+    headers = dict(HEADERS)
+    etag = read_etag(out_path)
+    if etag:
+        headers["If-None-Match"] = etag
+    with session.get(url, headers=headers, stream=True, timeout=60) as r:
+        if r.status_code == 304:
+            print(f"Not modified, skipping: {out_path}")
+            return out_path
         r.raise_for_status()
-        with open(out_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
+        base, ext = os.path.splitext(out_path)
+        counter = 1
+        with _PATH_LOCK:
+            # our own earlier download (it has an .etag next to it) that the probe found stale is
+            # refreshed in place, so later runs keep probing the current copy
+            refresh = os.path.exists(out_path + ".etag") and not os.path.exists(out_path + PART_SUFFIX)
+            if not refresh:
+                # never overwrite anyone else's file: add suffix if exists
+                while os.path.exists(out_path) or os.path.exists(out_path + PART_SUFFIX):
+                    out_path = f"{base}({counter}){ext}"
+                    counter += 1
+            # reserve the name so a concurrent download can't pick it too
+            open(out_path + PART_SUFFIX, "wb").close()
+        print(f"Downloading: {url} -> {out_path}")
+        stream_to_file(r, out_path)
+        save_etag(out_path, r.headers.get("ETag"))
     return out_path
 
+def find_hrefs_from_json(year, month):
+    """Read the file list embedded in the page HTML, no browser needed.
+    Raises RuntimeError if the page no longer embeds monthPortfolioContent."""
+    resp = SESSION.get(PAGE_URL, timeout=30)
+    resp.raise_for_status()
+    mp = find_month_portfolio_content(resp.text)
+    matches = filter_files(mp.get('files') or [], month, str(year))
+    print(f"Found {len(matches)} matching file(s) in embedded JSON.")
+    return [url for _, url in matches]
+
+def download_all(hrefs, dest_folder):
+    """Download the files concurrently over the shared keep-alive session."""
+    downloaded_files = []
+    # the Selenium path never touched SESSION, and the files may sit on another host than the page
+    warm_up(urljoin(PAGE_URL, hrefs[0]), SESSION)
+    with ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS) as ex:
+        # some links are relative
+        futs = {ex.submit(download_file, urljoin(PAGE_URL, h), dest_folder, SESSION): h for h in hrefs}
+        for fut in as_completed(futs):
+            try:
+                downloaded_files.append(fut.result())
+            except Exception as e:
+                print(f"Failed to download {urljoin(PAGE_URL, futs[fut])}: {e}")
+    return downloaded_files
+
 # ----- Main scraping function -----
 def scrape_and_download(year, month, dest_folder, headless=False, wait_timeout=60):
     ensure_folder(dest_folder)
+    remove_stale_parts(dest_folder)
 
+    # JSON extraction is primary; only boot Chrome when the page stops embedding the file list
+    try:
+        hrefs = find_hrefs_from_json(year, month)
+    except RuntimeError as e:
+        print(f"{e}; falling back to Selenium.")
+        hrefs = find_hrefs_with_selenium(year, month, dest_folder, headless, wait_timeout)
+
+    if not hrefs:
+        return []
+    return download_all(hrefs, dest_folder)
+
+def find_hrefs_with_selenium(year, month, dest_folder, headless=False, wait_timeout=60):
+    """Drive the year/month selects in Chrome and collect the .xls/.xlsx links."""
     chrome_options = webdriver.ChromeOptions()
     if headless:
         chrome_options.add_argument("--headless=new")
@@ -74,12 +147,25 @@ def scrape_and_download(year, month, dest_folder, headless=False, wait_timeout=6
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("--window-size=1920,1080")
+    # only selects and anchors are read: return at DOMContentLoaded and skip images/extras
+    chrome_options.page_load_strategy = "eager"
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    for flag in ("--disable-extensions", "--disable-translate", "--disable-background-networking",
+                 "--disable-sync", "--disable-default-apps", "--no-first-run", "--mute-audio"):
+        chrome_options.add_argument(flag)
+    chrome_options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
+    })
 
-    driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=chrome_options)
+    # Selenium Manager (built into selenium>=4.11) resolves and caches chromedriver itself
+    driver = webdriver.Chrome(options=chrome_options)
 
     try:
         driver.get(PAGE_URL)
-        wait = WebDriverWait(driver, wait_timeout)
+        # poll every 100ms instead of sleeping a fixed amount between steps
+        wait = WebDriverWait(driver, wait_timeout, poll_frequency=0.1,
+                             ignored_exceptions=(StaleElementReferenceException, NoSuchElementException))
 
         # Wait for at least one select element to appear on the page
         try:
@@ -102,59 +188,43 @@ def scrape_and_download(year, month, dest_folder, headless=False, wait_timeout=6
             raise
 
         selects = driver.find_elements(By.TAG_NAME, "select")
+        select_options = driver.execute_script(_SELECT_OPTIONS_JS)
         found_year = False
         found_month = False
+        year_str = str(year)
+        month_lo = month.strip().lower()
 
-        for s in selects:
-            try:
-                sel = Select(s)
-            except Exception:
-                continue
-            option_texts = [o.text.strip() for o in sel.options if o.text.strip()]
-            # try match year
-            if not found_year and any(str(year) == opt or str(year) in opt for opt in option_texts):
-                # try exact match first, else choose the option that contains the year string
-                try:
-                    sel.select_by_visible_text(str(year))
-                except Exception:
-                    # fallback: find partial match
-                    for o in sel.options:
-                        if str(year) in o.text:
-                            sel.select_by_visible_text(o.text)
-                            break
-                print(f"Selected year {year} in a select.")
-                found_year = True
-                time.sleep(0.5)
-                continue
+        # decide in Python which select matches; only the chosen ones cost a WebDriver call
+        for s, options in zip(selects, select_options):
+            option_texts = [t for t in options if t]
+            # try match year: exact match first, else the option that contains the year string
+            if not found_year:
+                matched = year_str if year_str in option_texts else next((t for t in option_texts if year_str in t), None)
+                if matched:
+                    sel = Select(s)
+                    sel.select_by_visible_text(matched)
+                    print(f"Selected year {year} in a select.")
+                    found_year = True
+                    wait.until(lambda d, sel=sel: year_str in sel.first_selected_option.text)
+                    continue
 
-            # try match month (visible text likely full month name)
-            if not found_month and any(month.lower() == opt.lower() or month.lower() in opt.lower() for opt in option_texts):
-                # prefer exact case-insensitive match
-                matched = None
-                for o in sel.options:
-                    if o.text.strip().lower() == month.strip().lower():
-                        matched = o.text
-                        break
-                if not matched:
-                    for o in sel.options:
-                        if month.strip().lower() in o.text.strip().lower():
-                            matched = o.text
-                            break
+            # try match month (visible text likely full month name), preferring exact case-insensitive match
+            if not found_month:
+                lowered = [t.lower() for t in option_texts]
+                matched = next((t for t, lo in zip(option_texts, lowered) if lo == month_lo), None) \
+                    or next((t for t, lo in zip(option_texts, lowered) if month_lo in lo), None)
                 if matched:
+                    sel = Select(s)
                     sel.select_by_visible_text(matched)
                     print(f"Selected month {matched} in a select.")
                     found_month = True
-                    time.sleep(0.5)
+                    wait.until(lambda d, sel=sel, matched=matched: sel.first_selected_option.text.strip() == matched)
                     continue
 
         if not (found_year and found_month):
             print("Warning: couldn't automatically find both Year and Month selects. Listing selects & options for debugging:")
-            for idx, s in enumerate(selects, start=1):
-                try:
-                    sel = Select(s)
-                    print(f"Select #{idx} options: {[o.text for o in sel.options]}")
-                except Exception:
-                    pass
+            for idx, options in enumerate(select_options, start=1):
+                print(f"Select #{idx} options: {options}")
             print("You may need to adjust the script selectors manually.")
             # continue anyway
 
@@ -167,7 +237,7 @@ def scrape_and_download(year, month, dest_folder, headless=False, wait_timeout=6
                 txt = b.text.strip().lower()
                 if "search" in txt or "submit" in txt or "filter" in txt:
                     try:
-                        b.click()
+                        wait.until(EC.element_to_be_clickable(b)).click()
                         clicked = True
                         print("Clicked a button with text:", b.text)
                         break
@@ -193,16 +263,9 @@ def scrape_and_download(year, month, dest_folder, headless=False, wait_timeout=6
             except Exception:
                 pass
 
-        # wait for results area: detect links to .xls/.xlsx
-        # give page JS some time to load results
-        time.sleep(2)
-        # Wait until at least one link with xls/xlsx is present or timeout
-        def links_present(driver):
-            elems = driver.find_elements(By.XPATH, "//a[contains(@href,'.xls') or contains(@href,'.xlsx')]")
-            return len(elems) > 0
-
+        # wait for results area: until at least one link with xls/xlsx is present or timeout
         try:
-            wait.until(lambda d: links_present(d))
+            wait.until(EC.presence_of_element_located((By.XPATH, "//a[contains(@href,'.xls')]")))
         except Exception as e:
             # Save debug artifacts for investigation
             ts = int(time.time())
@@ -220,30 +283,26 @@ def scrape_and_download(year, month, dest_folder, headless=False, wait_timeout=6
             print(f"Timeout waiting for download links. Saved screenshot: {debug_png} and HTML: {debug_html}")
             # continue to try to find any links that may already be present
 
-        links = driver.find_elements(By.XPATH, "//a[contains(@href,'.xls') or contains(@href,'.xlsx')]")
+        # snapshot the page once and scan it in-process instead of a WebDriver call per element
+        tree = lx.fromstring(driver.page_source)
         hrefs = []
-        for a in links:
-            href = a.get_attribute("href")
-            if href and (href.lower().endswith(".xls") or href.lower().endswith(".xlsx")):
+        for href in tree.xpath("//a[contains(@href,'.xls')]/@href"):
+            href = href.strip()
+            if href.lower().endswith((".xls", ".xlsx")):
                 hrefs.append(href)
 
         # deduplicate preserving order
-        seen = set()
-        hrefs = [h for h in hrefs if not (h in seen or seen.add(h))]
+        hrefs = list(dict.fromkeys(hrefs))
 
         if not hrefs:
             # sometimes the table contains buttons that trigger downloads via javascript; try scanning onclick attributes
             onclick_links = []
-            anchors = driver.find_elements(By.XPATH, "//*[contains(@onclick,'xls') or contains(@onclick,'xlsx')]")
-            for el in anchors:
-                onclick = el.get_attribute("onclick") or ""
+            for onclick in tree.xpath("//*[contains(@onclick,'xls')]/@onclick"):
                 # try to extract URL in quotes
-                import re
-                m = re.search(r"(https?://[^\s'\"\\)]+\.xls[x]?)", onclick)
+                m = _XLS_URL_RE.search(onclick)
                 if m:
-                    url = m.group(1)
-                    onclick_links.append(url)
-            hrefs = onclick_links
+                    onclick_links.append(m.group(1))
+            hrefs = list(dict.fromkeys(onclick_links))
 
         if not hrefs:
             print("No direct .xls/.xlsx links found after selecting year/month. The page may use dynamic JS or a different flow.")
@@ -252,22 +311,7 @@ def scrape_and_download(year, month, dest_folder, headless=False, wait_timeout=6
             return []
 
         print(f"Found {len(hrefs)} excel file link(s).")
-
-        # Use requests to download each file
-        session = requests.Session()
-        session.headers.update(HEADERS)
-
-        downloaded_files = []
-        for href in hrefs:
-            # some links are relative
-            full_url = urljoin(PAGE_URL, href)
-            try:
-                path = download_file(full_url, dest_folder, session=session)
-                downloaded_files.append(path)
-            except Exception as e:
-                print(f"Failed to download {full_url}: {e}")
-
-        return downloaded_files
+        return hrefs
 
     finally:
         driver.quit()
@@ -17,91 +17,171 @@ import json
 import os
 import re
 import requests
+import shutil
 import sys
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+
+HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                         "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"}
+
+# One keep-alive session for the page fetch and every download (same host)
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+SESSION.mount('https://', _adapter)
+SESSION.mount('http://', _adapter)
+
+_MONTHS = {
+    'january':'January','february':'February','march':'March','april':'April','may':'May','june':'June',
+    'july':'July','august':'August','september':'September','october':'October','november':'November','december':'December'
+}
+_SHORT_MAP = {k[:3]:v for k,v in _MONTHS.items()}
+
+# suffix of in-progress downloads; tool-specific so cleanup never touches other programs' .part files
+PART_SUFFIX = '.hdfc-part'
+
+_KEY_RE = re.compile(r'"monthPortfolioContent"\s*:')
+_DEC = json.JSONDecoder()
 
 
 def extract_json_object(text, start_at):
-    """Return substring of balanced JSON object starting at first '{' at/after start_at."""
+    """Return the JSON object decoded from the first '{' at/after start_at.
+    raw_decode scans in C and handles braces inside string literals."""
     i = text.find('{', start_at)
     if i == -1:
         raise ValueError('No opening brace found')
-    depth = 0
-    for j in range(i, len(text)):
-        ch = text[j]
-        if ch == '{':
-            depth += 1
-        elif ch == '}':
-            depth -= 1
-            if depth == 0:
-                return text[i:j+1]
-    raise ValueError('No matching closing brace found')
+    obj, _ = _DEC.raw_decode(text, i)
+    return obj
 
 
 def find_month_portfolio_content(html):
-    soup = BeautifulSoup(html, 'html.parser')
-    # Find script tags that contain the marker
-    scripts = soup.find_all('script')
-    marker = 'monthPortfolioContent'
-    for s in scripts:
-        if not s.string:
+    # One regex pass over the raw HTML: the key only occurs inside the embedded <script> payload,
+    # wherever it is nested (e.g. StatutoryDisclosures -> monthPortfolioContent). Only the value
+    # that follows it is decoded.
+    for k in _KEY_RE.finditer(html):
+        try:
+            return extract_json_object(html, k.end())
+        except ValueError:
+            # unbalanced or not valid JSON; try the next occurrence
             continue
-        if marker in s.string:
-            try:
-                idx = s.string.find(marker)
-                # back up a bit to capture the enclosing object (start at marker-50 safely)
-                start_search = max(0, idx - 100)
-                obj_text = extract_json_object(s.string, start_search)
-                # obj_text may be a large JS object containing many keys. We want to locate
-                # the monthPortfolioContent value inside it. We'll parse the obj and extract key.
-                data = json.loads(obj_text)
-                # Try to get monthPortfolioContent directly
-                # This will work if the script contains a plain JSON object.
-                if 'monthPortfolioContent' in data:
-                    return data['monthPortfolioContent']
-                # Otherwise, try nested lookup for StatutoryDisclosures -> monthPortfolioContent
-                if 'StatutoryDisclosures' in data and 'monthPortfolioContent' in data['StatutoryDisclosures']:
-                    return data['StatutoryDisclosures']['monthPortfolioContent']
-            except Exception:
-                # fallback: try to extract only the monthPortfolioContent object by searching for its key
-                txt = s.string
-                key_idx = txt.find('"monthPortfolioContent"')
-                if key_idx != -1:
-                    try:
-                        # find the ':' after the key
-                        colon_idx = txt.find(':', key_idx)
-                        if colon_idx != -1:
-                            obj = extract_json_object(txt, colon_idx)
-                            return json.loads(obj)
-                    except Exception:
-                        pass
     raise RuntimeError('monthPortfolioContent not found in any <script> tag')
 
 
-def download_file(url, dest, session=None):
-    s = session or requests.session()
+def probe(url, path, session):
+    """HEAD the URL and return True if the local file at path has the same Content-Length.
+    Encoded (e.g. gzip) responses never match: files are saved decoded, so those fall through
+    to the conditional GET."""
+    if not os.path.exists(path):
+        return False
+    try:
+        h = session.head(url, allow_redirects=True, timeout=10)
+    except requests.RequestException:
+        return False
+    length = h.headers.get('content-length')
+    if length is None or h.headers.get('content-encoding', 'identity').lower() != 'identity':
+        return False
+    try:
+        return int(length) == os.path.getsize(path)
+    except ValueError:
+        # malformed or comma-joined Content-Length
+        return False
+
+
+def warm_up(url, session):
+    """HEAD url once so DNS is cached and a TLS connection to its host sits in the pool
+    before the parallel downloads start."""
+    try:
+        session.head(url, allow_redirects=True, timeout=5)
+    except requests.RequestException:
+        pass
+
+
+def read_etag(path):
+    """Return the ETag cached next to a previously downloaded file, if both exist."""
+    etag_path = path + '.etag'
+    if not (os.path.exists(path) and os.path.exists(etag_path)):
+        return None
+    with open(etag_path) as f:
+        return f.read().strip() or None
+
+
+def save_etag(path, etag):
+    """Write etag next to path; an empty .etag still marks the file as downloaded by this tool."""
+    with open(path + '.etag', 'w') as f:
+        f.write(etag or '')
+
+
+def stream_to_file(r, dest):
+    """Write a streamed response to dest via dest + PART_SUFFIX, fsync'd and renamed only on
+    success, so an interrupted run never leaves a truncated file under the final name."""
+    tmp = dest + PART_SUFFIX
+    r.raw.decode_content = True
+    with open(tmp, 'wb') as f:
+        shutil.copyfileobj(r.raw, f, length=1 << 20)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, dest)
+
+
+def remove_stale_parts(folder):
+    """Delete PART_SUFFIX leftovers from this tool's interrupted downloads."""
+    for name in os.listdir(folder):
+        if name.endswith(PART_SUFFIX):
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass
+
+
+def download_file(url, dest, session):
+    """Download url to dest unless the local copy is current. Returns False if skipped."""
+    if probe(url, dest, session):
+        return False
+    headers = {}
+    etag = read_etag(dest)
+    if etag:
+        headers['If-None-Match'] = etag
     # stream download
-    with s.get(url, stream=True, timeout=30) as r:
+    with session.get(url, headers=headers, stream=True, timeout=30) as r:
+        if r.status_code == 304:
+            return False
         r.raise_for_status()
-        total = r.headers.get('content-length')
-        with open(dest, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
+        stream_to_file(r, dest)
+        save_etag(dest, r.headers.get('ETag'))
+    return True
+
+
+def filter_files(files, month, year_num=None):
+    """Return (title, url) pairs whose title or URL mentions the month (and year, if given).
+    Matching is case-insensitive."""
+    m_lo = month.lower()
+    y_lo = (year_num or '').lower()
+    matches = []
+    for entry in files:
+        url = (entry.get('file') or {}).get('url')
+        if not url:
+            continue
+        title = entry.get('title') or ''
+        # Filter by month and year appearing in filename or URL
+        # Example filename contains '30 September 2025'
+        title_lo = title.lower()
+        url_lo = url.lower()
+        if m_lo not in title_lo and m_lo not in url_lo:
+            continue
+        if y_lo and y_lo not in title_lo and y_lo not in url_lo:
+            continue
+        matches.append((title, url))
+    return matches
 
 
 def normalize_month_input(month):
     m = month.strip().lower()
-    months = {
-        'january':'January','february':'February','march':'March','april':'April','may':'May','june':'June',
-        'july':'July','august':'August','september':'September','october':'October','november':'November','december':'December'
-    }
-    if m in months:
-        return months[m]
+    if m in _MONTHS:
+        return _MONTHS[m]
     # accept short forms
-    short_map = {k[:3]:v for k,v in months.items()}
-    if m[:3] in short_map:
-        return short_map[m[:3]]
+    if m[:3] in _SHORT_MAP:
+        return _SHORT_MAP[m[:3]]
     raise ValueError('Unknown month: %s' % month)
 
 
@@ -129,9 +209,10 @@ def main():
 
     outdir = os.path.expanduser(args.out)
     os.makedirs(outdir, exist_ok=True)
+    remove_stale_parts(outdir)
 
     print('Fetching page:', args.url)
-    resp = requests.get(args.url, timeout=30)
+    resp = SESSION.get(args.url, timeout=30)
     resp.raise_for_status()
     html = resp.text
 
@@ -145,21 +226,7 @@ def main():
     files = mp.get('files') or []
     print('Total files in JSON:', len(files))
 
-    matches = []
-    for entry in files:
-        title = entry.get('title') or ''
-        fileobj = entry.get('file') or {}
-        url = fileobj.get('url')
-        if not url:
-            continue
-        # Filter by month and year appearing in filename or URL
-        # Example filename contains '30 September 2025'
-        ok_month = month in title or month in url
-        ok_year = True
-        if year_num:
-            ok_year = (year_num in title) or (year_num in url)
-        if ok_month and ok_year:
-            matches.append((title, url))
+    matches = filter_files(files, month, year_num)
 
     if not matches:
         print('No matching files found for month=%s year=%s' % (month, year_num))
@@ -180,20 +247,36 @@ def main():
         print('\nDry-run enabled; not downloading. Change to download by removing --dry-run.')
         sys.exit(0)
 
-    session = requests.Session()
+    # resolve destinations up front so workers never race on the same path
+    jobs = {}
     for title, url in matches:
         # sanitize filename
         fname = os.path.basename(url.split('?')[0])
         dest = os.path.join(outdir, fname)
-        if os.path.exists(dest):
-            print('Skipping existing file:', fname)
+        if dest in jobs:
+            print('Skipping duplicate file:', fname)
             continue
-        print('Downloading:', fname)
-        try:
-            download_file(url, dest, session=session)
-            print('Saved to', dest)
-        except Exception as exc:
-            print('Failed to download', url, '->', exc)
+        jobs[dest] = url
+
+    # the files may live on a different host than the page (e.g. a CDN)
+    if jobs:
+        warm_up(next(iter(jobs.values())), SESSION)
+
+    # existing files are re-checked against the server (size / ETag) instead of skipped by name
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        futs = {}
+        for dest, url in jobs.items():
+            print('Downloading:', os.path.basename(dest))
+            futs[ex.submit(download_file, url, dest, SESSION)] = (url, dest)
+        for fut in as_completed(futs):
+            url, dest = futs[fut]
+            try:
+                if fut.result():
+                    print('Saved to', dest)
+                else:
+                    print('Skipping up-to-date file:', os.path.basename(dest))
+            except Exception as exc:
+                print('Failed to download', url, '->', exc)
 
 
 if __name__ == '__main__':
@@ -10,18 +10,126 @@ import os
 import time
 import json
 import re
+import shutil
+import calendar
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from urllib.parse import urljoin, urlparse
+from urllib3.util.retry import Retry
 from seleniumwire import webdriver  # pip install selenium-wire
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select, WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service as ChromeService
 
+# HTTP/2 downloads multiplexed over one connection (pip install "httpx[http2]"); requests otherwise
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
 PAGE_URL = "https://www.hdfcfund.com/statutory-disclosure/portfolio/monthly-portfolio"
 TARGET_FOLDER = r"F:\MF Holdings"
 HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
+MAX_DOWNLOAD_WORKERS = 8
+MONTHS_FULL = calendar.month_name[1:]
+MONTHS_LOWER = [m.lower() for m in MONTHS_FULL]
+# analytics/ad hosts the page loads that never carry file URLs
+EXCLUDE_HOSTS = ['google-analytics.com', 'googletagmanager.com', 'facebook.net']
+# requests selenium-wire records (regexes on the URL)
+CAPTURE_SCOPES = [r'.*hdfcfund\.com.*', r'.*\.xlsx?$']
+_STATIC_ASSET_EXTS = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg', '.ico',
+                      '.woff', '.woff2', '.ttf', '.otf', '.eot')
+
+# write buffer for downloaded files: a few large write() calls instead of one per chunk
+_WRITE_BUFFER = 8 << 20
+_COPY_CHUNK = 1 << 20
+
+# browser reused across scrape_and_download calls in one process (see get_driver/shutdown)
+_DRIVER = None
+_DRIVER_HEADFUL = None
+_CHROMEDRIVER_PATH = None
+
+# One keep-alive session for every download, pool sized for the parallel workers
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16,
+                       max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]))
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
+# file URLs inside a response body, matched on the raw bytes (no decode)
+_XLSX_URL_RE = re.compile(rb"https?://[^'\"\s>]+\.(?:xlsx|xls)", re.IGNORECASE)
+_MAX_SCAN_BYTES = 2_000_000
+
+# XPath lowercasing helper; the filters below run inside the browser so only matches cross the wire
+_LOWER = "'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'"
+_COOKIE_XPATH = " | ".join([
+    f"//button[contains(translate(., {_LOWER}), 'accept')]",
+    f"//button[contains(translate(., {_LOWER}), 'agree')]",
+    f"//button[contains(translate(., {_LOWER}), 'ok')]",
+    f"//button[contains(translate(., {_LOWER}), 'close')]",
+    f"//a[contains(translate(., {_LOWER}), 'accept')]",
+    "//button[contains(@id,'cookie') or contains(@class,'cookie') or contains(@class,'consent')]",
+])
+# clicks the first visible match of the cookie XPath in the browser; returns its text, or null
+_CLICK_COOKIE_JS = """
+const r = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+for (let i = 0; i < r.snapshotLength; i++) {
+    const e = r.snapshotItem(i);
+    const s = getComputedStyle(e);
+    if (s.display !== 'none' && s.visibility !== 'hidden' && e.getClientRects().length) {
+        e.click();
+        return (e.textContent || '').trim();
+    }
+}
+return null;
+"""
+_MONTHLY_TAGS = ("a", "button", "li", "span", "div")  # click priority
+_MONTHLY_XPATH = (
+    "//*[self::a or self::button or self::li or self::span or self::div]"
+    f"[contains(translate(normalize-space(.), {_LOWER}), 'monthly')"
+    f" or contains(translate(@aria-label, {_LOWER}), 'monthly')"
+    f" or contains(translate(@title, {_LOWER}), 'monthly')]"
+)
+_PORTFOLIO_XPATH = f"(//a|//button|//li|//span)[contains(translate(normalize-space(.), {_LOWER}), 'portfolio')]"
+# (label text, XPath of <label>s containing it), in lookup order
+_LABEL_XPATHS = tuple(
+    (t, f"//label[contains(translate(., {_LOWER}), '{t}')]")
+    for t in ("search by year", "search by year:", "select month", "select month:", "year", "month")
+)
+_SUBMIT_INPUT_XPATH = "//input[@type='button' or @type='submit']"
+_SET_VALUE_JS = "arguments[0].value = arguments[1]; arguments[0].dispatchEvent(new Event('change'));"
+# controls whose placeholder/aria-label/name mention year or month, with their tag, in one round-trip
+_YEAR_MONTH_CONTROLS_JS = """
+return Array.from(document.querySelectorAll('input,select,div,span')).map(e => {
+    const attrs = [e.getAttribute('placeholder'), e.getAttribute('aria-label'), e.getAttribute('name')]
+        .map(v => (v || '').trim().toLowerCase()).join(' ');
+    return {el: e, tag: e.tagName.toLowerCase(), year: attrs.includes('year'), month: attrs.includes('month')};
+}).filter(o => o.year || o.month);
+"""
+# trimmed text of every <option> of a select, in one round-trip
+_OPTION_TEXTS_JS = "return Array.from(arguments[0].options, o => o.textContent.trim());"
+# where the selects live: this document, the index of a same-origin iframe holding one,
+# and the indices of cross-origin iframes whose documents can't be inspected from here
+_LOCATE_SELECTS_JS = """
+if (document.querySelector('select')) return {here: true, idx: -1, opaque: []};
+const opaque = [];
+const idx = Array.from(document.querySelectorAll('iframe')).findIndex((f, i) => {
+    try {
+        if (f.contentDocument) return f.contentDocument.querySelectorAll('select').length > 0;
+    } catch (e) {}
+    opaque.push(i);
+    return false;
+});
+return {here: false, idx: idx, opaque: opaque};
+"""
+# resolved hrefs of every anchor pointing at an .xls/.xlsx file, in one round-trip
+_XLS_ANCHORS_JS = "return Array.from(document.querySelectorAll('a[href*=\".xls\"]'), a => a.href).filter(Boolean);"
 
 def ensure_folder(path):
     os.makedirs(path, exist_ok=True)
@@ -29,101 +137,196 @@ def ensure_folder(path):
 def prompt_year_month():
     year = input("Enter year (e.g. 2024): ").strip()
     month_in = input("Enter month (name or number, e.g. Jan or 1 or January): ").strip()
-    month_map = {
-        '1': 'January', '01': 'January', 'jan': 'January', 'january': 'January',
-        '2': 'February', '02': 'February', 'feb': 'February', 'february': 'February',
-        '3': 'March', '03': 'March', 'mar': 'March', 'march': 'March',
-        '4': 'April', '04': 'April', 'apr': 'April', 'april': 'April',
-        '5': 'May', '05': 'May',
-        '6': 'June', '06': 'June', 'jun': 'June', 'june': 'June',
-        '7': 'July', '07': 'July', 'jul': 'July', 'july': 'July',
-        '8': 'August', '08': 'August', 'aug': 'August', 'august': 'August',
-        '9': 'September', '09': 'September', 'sep': 'September', 'september': 'September',
-        '10': 'October', 'oct': 'October', 'october': 'October',
-        '11': 'November', 'nov': 'November', 'november': 'November',
-        '12': 'December', 'dec': 'December', 'december': 'December'
-    }
+    return year, normalize_month(month_in)
+
+def normalize_month(month_in):
+    """Full month name for a number (1/01) or a name prefix of at least 3 letters (jan, Sept).
+    Raises ValueError for anything else, rather than guess a month."""
     key = month_in.strip().lower()
-    month = month_map.get(key, month_in)
-    return year, month
+    if key.isdigit():
+        n = int(key)
+        if 1 <= n <= 12:
+            return MONTHS_FULL[n - 1]
+    elif len(key) >= 3:
+        matches = [m for m, l in zip(MONTHS_FULL, MONTHS_LOWER) if l.startswith(key)]
+        if len(matches) == 1:
+            return matches[0]
+    raise ValueError('Unknown month: %s' % month_in)
+
+def make_download_client(cookies):
+    """Client for the file GETs carrying the browser's cookies: an HTTP/2 httpx.Client when
+    httpx and h2 are installed, else the shared requests SESSION."""
+    if HTTPX_AVAILABLE:
+        jar = httpx.Cookies()
+        for ck in cookies:
+            jar.set(ck['name'], ck['value'], domain=ck.get('domain') or '')
+        try:
+            return httpx.Client(http2=True, headers=HEADERS, cookies=jar, timeout=60,
+                                follow_redirects=True, limits=httpx.Limits(max_connections=16))
+        except ImportError:
+            # httpx without the h2 extra
+            pass
+    for ck in cookies:
+        SESSION.cookies.set(ck['name'], ck['value'], domain=ck.get('domain'))
+    return SESSION
+
+def _reserve_unique(base, ext, max_tries=1000):
+    """Create an empty base+ext, or base(1)+ext, base(2)+ext, ... whichever doesn't exist yet,
+    and return its path. O_EXCL makes the create atomic, so parallel downloads never share a name."""
+    for i in range(max_tries):
+        path = f"{base}{ext}" if i == 0 else f"{base}({i}){ext}"
+        try:
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+        except FileExistsError:
+            continue
+        return path
+    raise FileExistsError(f"No free file name for {base}{ext}")
+
+def _open_for_write(path):
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    return os.fdopen(fd, "wb", buffering=_WRITE_BUFFER)
+
+def read_meta(path):
+    """Return the validators saved next to a previous download of path, if both exist."""
+    meta_path = path + ".meta.json"
+    if not (os.path.exists(path) and os.path.exists(meta_path)):
+        return None
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_meta(path, url, resp_headers):
+    meta = {
+        "url": url,
+        "etag": resp_headers.get("ETag"),
+        "content_length": resp_headers.get("Content-Length"),
+        "last_modified": resp_headers.get("Last-Modified"),
+    }
+    with open(path + ".meta.json", "w") as f:
+        json.dump(meta, f)
+
+def is_unchanged(session, url, headers, meta):
+    """Conditional HEAD against the saved validators; True on 304 or an identical ETag."""
+    cond = dict(headers)
+    if meta.get("etag"):
+        cond["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        cond["If-Modified-Since"] = meta["last_modified"]
+    try:
+        if HTTPX_AVAILABLE and isinstance(session, httpx.Client):
+            h = session.head(url, headers=cond)
+        else:
+            h = session.head(url, headers=cond, allow_redirects=True, timeout=15)
+    except Exception:
+        return False
+    if h.status_code == 304:
+        return True
+    etag = h.headers.get("ETag")
+    return h.status_code == 200 and etag is not None and etag == meta.get("etag")
 
-def download_file(url, dest_folder, session=None, headers=None):
-    session = session or requests
+def download_file(url, dest_folder, session=SESSION, headers=None):
     headers = headers or HEADERS
     parsed = urlparse(url)
     filename = os.path.basename(parsed.path) or "download.xlsx"
-    out_path = os.path.join(dest_folder, filename)
-    base, ext = os.path.splitext(out_path)
-    counter = 1
-    while os.path.exists(out_path):
-        out_path = f"{base}({counter}){ext}"
-        counter += 1
-    print(f"Downloading {url} -> {out_path}")
-    with session.get(url, headers=headers, stream=True, timeout=60) as r:
+    path = os.path.join(dest_folder, filename)
+    meta = read_meta(path)
+    if meta and meta.get("url") == url:
+        if is_unchanged(session, url, headers, meta):
+            print(f"Up to date, skipping {url} -> {path}")
+            return path
+        # our own earlier download of this URL: refresh it in place
+        out_path = path
+    else:
+        # new file, or a different URL with the same basename: never overwrite it
+        out_path = None
+    use_httpx = HTTPX_AVAILABLE and isinstance(session, httpx.Client)
+    if use_httpx:
+        response = session.stream("GET", url, headers=headers)
+    else:
+        response = session.get(url, headers=headers, stream=True, timeout=60)
+    with response as r:
         r.raise_for_status()
-        with open(out_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-    return out_path
-
-def attempt_close_cookie_banner(driver):
-    # common cookie banner texts/selectors
-    candidates = [
-        "//button[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'accept')]",
-        "//button[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'agree')]",
-        "//button[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'ok')]",
-        "//button[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'close')]",
-        "//a[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'accept')]",
-        "//button[contains(@id,'cookie') or contains(@class,'cookie') or contains(@class,'consent')]",
-    ]
-    for xp in candidates:
+        # the name is only claimed once the server has answered with the file
+        reserved = out_path is None
+        if reserved:
+            out_path = _reserve_unique(*os.path.splitext(path))
+        print(f"Downloading {url} -> {out_path}")
+        # stream into .tmp and rename on success, so an interrupted run never leaves a truncated file
+        tmp = out_path + ".tmp"
         try:
-            els = driver.find_elements(By.XPATH, xp)
-            for el in els:
+            with _open_for_write(tmp) as f:
+                if use_httpx:
+                    for chunk in r.iter_bytes(_COPY_CHUNK):
+                        f.write(chunk)
+                else:
+                    r.raw.decode_content = True
+                    shutil.copyfileobj(r.raw, f, length=_COPY_CHUNK)
+            os.replace(tmp, out_path)
+        except BaseException:
+            # drop the partial .tmp and, for a new file, the empty placeholder holding its name
+            for leftover in (tmp, out_path) if reserved else (tmp,):
                 try:
-                    if el.is_displayed():
-                        el.click()
-                        print("Closed cookie/consent overlay using xpath:", xp)
-                        time.sleep(0.5)
-                        return True
-                except Exception:
+                    os.remove(leftover)
+                except OSError:
                     pass
-        except Exception:
-            continue
-    return False
+            raise
+        write_meta(out_path, url, r.headers)
+    return out_path
+
+def download_many(urls, dest_folder, session):
+    """Download urls concurrently over the shared session; returns the saved paths."""
+    downloaded = []
+    with ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS) as ex:
+        futs = {ex.submit(download_file, urljoin(PAGE_URL, u), dest_folder, session, HEADERS): u for u in urls}
+        for fut in as_completed(futs):
+            try:
+                downloaded.append(fut.result())
+            except Exception as e:
+                print("Download failed for", futs[fut], ":", e)
+    return downloaded
+
+def attempt_close_cookie_banner(driver):
+    # common cookie banner texts/selectors, queried as one XPath union; visibility check and
+    # click happen in the browser, so this is a single round-trip whether or not a banner is shown
+    try:
+        text = driver.execute_script(_CLICK_COOKIE_JS, _COOKIE_XPATH)
+    except Exception:
+        return False
+    if text is None:
+        return False
+    print("Closed cookie/consent overlay:", text)
+    time.sleep(0.3)
+    return True
 
 
 def click_monthly_tab(driver):
     """Try to click a tab or link that opens the Monthly portfolio view."""
-    texts = ["monthly", "monthly portfolio", "monthly-portfolio", "monthly_portfolio"]
-    # common xpath patterns for links/buttons/tabs
-    xpaths = [
-        "//a", "//button", "//li", "//span", "//div"
-    ]
-    for xp_root in xpaths:
+    # one query for links/buttons/tabs whose text, aria-label or title mentions 'monthly'
+    try:
+        els = driver.find_elements(By.XPATH, _MONTHLY_XPATH)
+    except Exception:
+        els = []
+    # keep the old preference order: anchors first, generic divs last
+    ranked = []
+    for el in els:
         try:
-            els = driver.find_elements(By.XPATH, xp_root)
+            ranked.append((_MONTHLY_TAGS.index(el.tag_name.lower()), el))
         except Exception:
             continue
-        for el in els:
-            try:
-                txt = (el.text or "").strip().lower()
-                if not txt:
-                    # check aria-label or title
-                    txt = ((el.get_attribute("aria-label") or "") + " " + (el.get_attribute("title") or "")).strip().lower()
-                for t in texts:
-                    if t in txt:
-                        try:
-                            if el.is_displayed():
-                                el.click()
-                                print("Clicked element with text/title containing:", t)
-                                time.sleep(1)
-                                return True
-                        except Exception:
-                            pass
-            except Exception:
-                continue
+    ranked.sort(key=lambda pair: pair[0])
+    for _, el in ranked:
+        try:
+            if el.is_displayed():
+                el.click()
+                print("Clicked element with text/title containing: monthly")
+                time.sleep(1)
+                return True
+        except Exception:
+            pass
 
     # also try specific xpath that matches nav links with 'monthly'
     try:
@@ -147,10 +350,9 @@ def set_year_month_controls(driver, year, month):
     set_any = False
 
     # 1) look for labels containing the texts and find associated control
-    label_texts = ["search by year", "search by year:", "select month", "select month:", "year", "month"]
-    for lbl_text in label_texts:
+    for lbl_text, lbl_xpath in _LABEL_XPATHS:
         try:
-            labels = driver.find_elements(By.XPATH, f"//label[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), '{lbl_text}')]")
+            labels = driver.find_elements(By.XPATH, lbl_xpath)
             for lab in labels:
                 try:
                     # associated control may be for attribute
@@ -173,7 +375,7 @@ def set_year_month_controls(driver, year, month):
                                 try:
                                     # set value via JS
                                     val = str(year) if 'year' in lbl_text else str(month)
-                                    driver.execute_script("arguments[0].value = arguments[1]; arguments[0].dispatchEvent(new Event('change'));", ctrl, val)
+                                    driver.execute_script(_SET_VALUE_JS, ctrl, val)
                                     set_any = True
                                 except Exception:
                                     pass
@@ -182,37 +384,23 @@ def set_year_month_controls(driver, year, month):
         except Exception:
             pass
 
-    # 2) inputs/selects with placeholder or aria-label matching
+    # 2) inputs/selects with placeholder, aria-label or name matching (filtered in the browser)
     try:
-        candidates = driver.find_elements(By.XPATH, "//input|//select|//div|//span")
-        for c in candidates:
+        candidates = driver.execute_script(_YEAR_MONTH_CONTROLS_JS) or []
+    except Exception:
+        candidates = []
+    for c in candidates:
+        for wanted, value in (('year', str(year)), ('month', str(month))):
+            if not c[wanted]:
+                continue
             try:
-                pl = (c.get_attribute('placeholder') or '').strip().lower()
-                al = (c.get_attribute('aria-label') or '').strip().lower()
-                name = (c.get_attribute('name') or '').strip().lower()
-                if 'year' in pl or 'year' in al or 'year' in name:
-                    # set year
-                    try:
-                        if c.tag_name.lower() == 'select':
-                            Select(c).select_by_visible_text(str(year))
-                        else:
-                            driver.execute_script("arguments[0].value = arguments[1]; arguments[0].dispatchEvent(new Event('change'));", c, str(year))
-                        set_any = True
-                    except Exception:
-                        pass
-                if 'month' in pl or 'month' in al or 'month' in name:
-                    try:
-                        if c.tag_name.lower() == 'select':
-                            Select(c).select_by_visible_text(str(month))
-                        else:
-                            driver.execute_script("arguments[0].value = arguments[1]; arguments[0].dispatchEvent(new Event('change'));", c, str(month))
-                        set_any = True
-                    except Exception:
-                        pass
+                if c['tag'] == 'select':
+                    Select(c['el']).select_by_visible_text(value)
+                else:
+                    driver.execute_script(_SET_VALUE_JS, c['el'], value)
+                set_any = True
             except Exception:
-                continue
-    except Exception:
-        pass
+                pass
 
     return set_any
 
@@ -221,16 +409,20 @@ def find_selects_in_current_context(driver):
     return selects
 
 def switch_to_frame_if_needed(driver):
-    # if no selects found in main context, inspect iframes and switch into one that contains selects
-    selects = find_selects_in_current_context(driver)
-    if selects:
+    # if no selects found in main context, find the iframe that contains them in the browser
+    # and switch into it once
+    loc = driver.execute_script(_LOCATE_SELECTS_JS)
+    if loc['here']:
         return True  # already good
-    frames = driver.find_elements(By.TAG_NAME, "iframe")
-    for f in frames:
+    if loc['idx'] >= 0:
+        driver.switch_to.frame(loc['idx'])
+        print("Switched into iframe for selects.")
+        return True
+    # cross-origin frames can only be checked from inside
+    for i in loc['opaque']:
         try:
-            driver.switch_to.frame(f)
-            selects = find_selects_in_current_context(driver)
-            if selects:
+            driver.switch_to.frame(i)
+            if find_selects_in_current_context(driver):
                 print("Switched into iframe for selects.")
                 return True
             driver.switch_to.default_content()
@@ -238,73 +430,139 @@ def switch_to_frame_if_needed(driver):
             driver.switch_to.default_content()
     return False
 
+def collect_file_urls(obj, urls):
+    """Recursively append strings ending in .xls/.xlsx found in parsed JSON."""
+    if isinstance(obj, str):
+        if obj.lower().endswith(('.xls', '.xlsx')):
+            urls.append(obj)
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            collect_file_urls(v, urls)
+    elif isinstance(obj, list):
+        for v in obj:
+            collect_file_urls(v, urls)
+
 def extract_urls_from_requests(driver):
     urls = []
     for req in driver.requests:
         try:
             # we only consider requests with response
-            if not hasattr(req, "response") or req.response is None:
+            resp = getattr(req, "response", None)
+            if resp is None:
                 continue
             u = req.url
             # direct excel links
-            if u.lower().endswith(".xls") or u.lower().endswith(".xlsx"):
+            if u.lower().endswith((".xls", ".xlsx")):
                 urls.append(u)
                 continue
-            # sometimes the response is a JSON with URLs
-            ct = req.response.headers.get("Content-Type", "")
-            if "application/json" in ct or "text/json" in ct or req.response.body:
+            # sometimes the response is a JSON (or text) with URLs; skip scripts, images, fonts...
+            ct = resp.headers.get("Content-Type", "") or ""
+            if not (ct.startswith(("application/json", "text/")) or "/portfolio/" in u):
+                continue
+            body = resp.body
+            if not body:
+                continue
+            # find urls ending with xls/xlsx inside the body, without decoding it
+            for m in _XLSX_URL_RE.findall(body[:_MAX_SCAN_BYTES]):
+                urls.append(m.decode("utf-8", errors="ignore"))
+            # also try basic JSON parse, only for bodies that look like JSON
+            if "json" in ct and body.lstrip()[:1] in (b"{", b"["):
                 try:
-                    text = req.response.body.decode('utf-8', errors='ignore')
-                    # find urls ending with xls/xlsx inside the body
-                    for m in re.findall(r"https?://[^'\"\\s>]+\\.(?:xlsx|xls)", text, flags=re.IGNORECASE):
-                        urls.append(m)
-                    # also try basic JSON parse
-                    try:
-                        data = json.loads(text)
-                        # recursive find strings in JSON
-                        def walk(obj):
-                            if isinstance(obj, str):
-                                if obj.lower().endswith(('.xls', '.xlsx')):
-                                    urls.append(obj)
-                            elif isinstance(obj, dict):
-                                for v in obj.values():
-                                    walk(v)
-                            elif isinstance(obj, list):
-                                for v in obj:
-                                    walk(v)
-                        walk(data)
-                    except Exception:
-                        pass
-                except Exception:
+                    collect_file_urls(json.loads(body), urls)
+                except ValueError:
                     pass
         except Exception:
             continue
     # dedupe while preserving order
-    seen = set()
-    out = []
-    for u in urls:
-        if u not in seen:
-            out.append(u)
-            seen.add(u)
-    return out
+    return list(dict.fromkeys(urls))
 
-def scrape_and_download(year, month, dest_folder, headful=True, wait_timeout=40):
-    ensure_folder(dest_folder)
+def wait_for_file_urls(driver, timeout):
+    """Poll the captured requests until a file URL shows up, or traffic has quiesced
+    (request count unchanged for 3 polls), bounded by timeout."""
+    counts = []
+
+    def _urls_ready(drv):
+        urls = extract_urls_from_requests(drv)
+        if urls:
+            return urls
+        counts.append(len(drv.requests))
+        return len(counts) >= 3 and counts[-1] > 0 and counts[-1] == counts[-2] == counts[-3]
+
+    try:
+        found = WebDriverWait(driver, timeout, poll_frequency=0.5).until(_urls_ready)
+    except TimeoutException:
+        return []
+    return found if isinstance(found, list) else []
+
+def _abort_static_assets(request):
+    """selenium-wire request interceptor: images and fonts are never needed, don't fetch them."""
+    if request.path.lower().endswith(_STATIC_ASSET_EXTS):
+        request.abort()
+
+def get_driver(headful=True):
+    """Return the browser kept alive from a previous call, or start one.
+    The chromedriver path is resolved only once per process."""
+    global _DRIVER, _DRIVER_HEADFUL, _CHROMEDRIVER_PATH
+    if _DRIVER is not None:
+        try:
+            _DRIVER.title  # raises if the browser/session is gone
+            if _DRIVER_HEADFUL == headful:
+                return _DRIVER
+        except Exception:
+            pass
+        shutdown()
 
     options = webdriver.ChromeOptions()
     if not headful:
         options.add_argument("--headless=new")
     options.add_argument("--disable-gpu")
     options.add_argument("--window-size=1920,1080")
-
-    # selenium-wire options (optional)
+    # the script only needs the form and the XHRs behind it: skip images, media and notifications
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
+        "profile.managed_default_content_settings.media_stream": 2,
+    })
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-background-networking")
+
+    # selenium-wire options: keep captures in memory (capped) instead of spooling them to disk,
+    # and ask for uncompressed bodies so extract_urls_from_requests can scan them as-is
     seleniumwire_options = {
-        # 'request_storage_base_dir': '/tmp/seleniumwire',  # adjust if needed
+        'request_storage': 'memory',
+        'request_storage_max_size': 200,
+        'disable_encoding': True,
+        # trackers are passed straight through and never enter driver.requests
+        'exclude_hosts': EXCLUDE_HOSTS,
     }
 
-    driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()),
-                              options=options,
-                              seleniumwire_options=seleniumwire_options)
+    if _CHROMEDRIVER_PATH is None:
+        _CHROMEDRIVER_PATH = ChromeDriverManager().install()
+    _DRIVER = webdriver.Chrome(service=ChromeService(_CHROMEDRIVER_PATH),
+                               options=options,
+                               seleniumwire_options=seleniumwire_options)
+    # only the site's own traffic and direct file links are captured
+    _DRIVER.scopes = CAPTURE_SCOPES
+    _DRIVER.request_interceptor = _abort_static_assets
+    _DRIVER_HEADFUL = headful
+    return _DRIVER
+
+def shutdown():
+    """Quit the cached browser, if any."""
+    global _DRIVER
+    if _DRIVER is not None:
+        try:
+            _DRIVER.quit()
+        except Exception:
+            pass
+        _DRIVER = None
+
+def scrape_and_download(year, month, dest_folder, headful=True, wait_timeout=40):
+    ensure_folder(dest_folder)
+
+    driver = get_driver(headful)
+    client = SESSION
 
     try:
         driver.get(PAGE_URL)
@@ -323,13 +581,8 @@ def scrape_and_download(year, month, dest_folder, headful=True, wait_timeout=40)
         # if monthly tab wasn't found, try clicking a 'Portfolio' link first then retry
         if not clicked_month:
             try:
-                portfolio_el = None
-                candidates = driver.find_elements(By.XPATH, "//a|//button|//li|//span")
-                for el in candidates:
-                    txt = (el.text or "").strip().lower()
-                    if 'portfolio' in txt:
-                        portfolio_el = el
-                        break
+                candidates = driver.find_elements(By.XPATH, _PORTFOLIO_XPATH)
+                portfolio_el = candidates[0] if candidates else None
                 if portfolio_el and portfolio_el.is_displayed():
                     try:
                         portfolio_el.click()
@@ -376,38 +629,34 @@ def scrape_and_download(year, month, dest_folder, headful=True, wait_timeout=40)
         # find Year and Month selects and set values
         found_year = False
         found_month = False
+        y_str = str(year)
+        m_low = month.strip().lower()
+        # option texts per select element, fetched once and reused by the fallback printout below
+        option_cache = {}
         for s in selects:
             try:
                 sel = Select(s)
             except Exception:
                 continue
-            option_texts = [o.text.strip() for o in sel.options if o.text.strip()]
-            # match year
-            if not found_year and any(str(year) == opt or str(year) in opt for opt in option_texts):
-                try:
-                    sel.select_by_visible_text(str(year))
-                except Exception:
-                    for o in sel.options:
-                        if str(year) in o.text:
-                            sel.select_by_visible_text(o.text)
-                            break
-                found_year = True
-                time.sleep(0.5)
-                continue
+            texts = option_cache[s.id] = driver.execute_script(_OPTION_TEXTS_JS, s) or []
+            # match year: exact text first, then containment
+            if not found_year:
+                i = next((i for i, t in enumerate(texts) if t == y_str), None)
+                if i is None:
+                    i = next((i for i, t in enumerate(texts) if t and y_str in t), None)
+                if i is not None:
+                    sel.select_by_index(i)
+                    found_year = True
+                    time.sleep(0.5)
+                    continue
             # match month
-            if not found_month and any(month.lower() == opt.lower() or month.lower() in opt.lower() for opt in option_texts):
-                matched = None
-                for o in sel.options:
-                    if o.text.strip().lower() == month.strip().lower():
-                        matched = o.text
-                        break
-                if not matched:
-                    for o in sel.options:
-                        if month.strip().lower() in o.text.strip().lower():
-                            matched = o.text
-                            break
-                if matched:
-                    sel.select_by_visible_text(matched)
+            if not found_month:
+                lower_texts = [t.lower() for t in texts]
+                i = next((i for i, t in enumerate(lower_texts) if t == m_low), None)
+                if i is None:
+                    i = next((i for i, t in enumerate(lower_texts) if t and m_low in t), None)
+                if i is not None:
+                    sel.select_by_index(i)
                     found_month = True
                     time.sleep(0.5)
                     continue
@@ -415,15 +664,12 @@ def scrape_and_download(year, month, dest_folder, headful=True, wait_timeout=40)
         if not (found_year and found_month):
             print("Couldn't find both Year and Month select choices automatically. Found selects (showing options):")
             for idx, s in enumerate(selects, start=1):
-                try:
-                    sel = Select(s)
-                    print(f"Select #{idx} options:", [o.text for o in sel.options][:20])
-                except Exception:
-                    pass
+                if s.id in option_cache:
+                    print(f"Select #{idx} options:", option_cache[s.id][:20])
             # continue anyway to capture network activity
 
         # Clear previously recorded requests
-        driver.requests.clear()
+        del driver.requests
 
         # Try to find and click a search/filter button
         clicked = False
@@ -442,7 +688,7 @@ def scrape_and_download(year, month, dest_folder, headful=True, wait_timeout=40)
             pass
         if not clicked:
             try:
-                inputs = driver.find_elements(By.XPATH, "//input[@type='button' or @type='submit']")
+                inputs = driver.find_elements(By.XPATH, _SUBMIT_INPUT_XPATH)
                 for inp in inputs:
                     val = (inp.get_attribute("value") or "").strip().lower()
                     if "search" in val or "submit" in val:
@@ -455,11 +701,9 @@ def scrape_and_download(year, month, dest_folder, headful=True, wait_timeout=40)
             except Exception:
                 pass
 
-        # wait a short while for XHRs to fire
-        time.sleep(6)
-
-        # Inspect captured requests for direct excel links or JSON containing links
-        found_urls = extract_urls_from_requests(driver)
+        # Inspect captured requests for direct excel links or JSON containing links,
+        # returning as soon as one appears instead of sleeping a fixed time
+        found_urls = wait_for_file_urls(driver, wait_timeout)
         if found_urls:
             print(f"Found {len(found_urls)} file URL(s) from network requests.")
         else:
@@ -474,37 +718,17 @@ def scrape_and_download(year, month, dest_folder, headful=True, wait_timeout=40)
                 except Exception:
                     pass
 
-        # Build a requests.Session with cookies from the browser so downloads that require cookies work
-        session = requests.Session()
-        session.headers.update(HEADERS)
-        for ck in driver.get_cookies():
-            session.cookies.set(ck['name'], ck['value'], domain=ck.get('domain'))
+        # Downloads bypass the browser; the client carries its cookies so protected URLs still work
+        client = make_download_client(driver.get_cookies())
 
-        downloaded = []
-        for u in found_urls:
-            try:
-                full = urljoin(PAGE_URL, u)
-                p = download_file(full, dest_folder, session=session, headers=HEADERS)
-                downloaded.append(p)
-            except Exception as e:
-                print("Download failed for", u, ":", e)
+        downloaded = download_many(found_urls, dest_folder, client)
 
         if not downloaded:
             # final attempt: find any anchors on page with .xls/.xlsx href attributes (in-case dynamic loaded)
-            anchors = driver.find_elements(By.XPATH, "//a[contains(@href,'.xls') or contains(@href,'.xlsx')]")
-            hrefs = []
-            for a in anchors:
-                href = a.get_attribute("href")
-                if href:
-                    hrefs.append(href)
+            hrefs = driver.execute_script(_XLS_ANCHORS_JS) or []
             if hrefs:
                 print("Found direct anchors on page:", hrefs)
-                for h in hrefs:
-                    try:
-                        fname = download_file(h, dest_folder, session=session, headers=HEADERS)
-                        downloaded.append(fname)
-                    except Exception as e:
-                        print("Failed download:", e)
+                downloaded = download_many(hrefs, dest_folder, client)
 
         if not downloaded:
             ts = int(time.time())
@@ -521,14 +745,25 @@ def scrape_and_download(year, month, dest_folder, headful=True, wait_timeout=40)
         return downloaded
 
     finally:
-        driver.quit()
+        if client is not SESSION:
+            client.close()
+        # keep the browser for the next call; just reset its state
+        try:
+            driver.switch_to.default_content()
+            driver.delete_all_cookies()
+            del driver.requests
+        except Exception:
+            shutdown()
 
 if __name__ == "__main__":
     print("HDFC Monthly downloader (network-capture mode)")
     y, m = prompt_year_month()
     print("Requested:", y, m)
     ensure_folder(TARGET_FOLDER)
-    files = scrape_and_download(y, m, TARGET_FOLDER, headful=True)
+    try:
+        files = scrape_and_download(y, m, TARGET_FOLDER, headful=True)
+    finally:
+        shutdown()
     if files:
         print("Downloaded files:")
         for f in files:
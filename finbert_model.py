@@ -0,0 +1,186 @@
+"""
+Shared FinBERT loader
+Loads ProsusAI/finbert (or another FinBERT-style checkpoint) once per process so every analyzer
+reuses the same tokenizer and model
+"""
+import functools
+import importlib.util
+import logging
+import os
+
+# torch and transformers are imported by get_finbert, so importing this module for its constants stays cheap
+torch = None
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "ProsusAI/finbert"
+# Distilled financial-sentiment model: ~40% smaller than BERT-base FinBERT with comparable accuracy
+DISTILLED_MODEL_NAME = "mrm8488/distilroberta-finetuned-financial-news-sentiment-analysis"
+# Token cap for the one-sentence news snippets; padding them toward 512 wastes attention/FFN work.
+# Longest built-in snippet is well under this; long_news=True restores BERT's 512 for external news.
+MAX_LENGTH = 64
+LONG_NEWS_MAX_LENGTH = 512
+# INT8-quantized FinBERT saved on first CPU run so later runs skip the conversion
+QUANT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'finbert_cache')
+# On GPU, batches are padded to a multiple of this so torch.compile sees few distinct sequence lengths
+COMPILE_PAD_MULTIPLE = 16
+# With accelerate installed, GPU weights are memory-mapped straight onto the device
+ACCELERATE_AVAILABLE = importlib.util.find_spec("accelerate") is not None
+# Column order the analyzers report FinBERT probabilities in
+SENTIMENT_LABELS = ("negative", "neutral", "positive")
+
+
+@functools.lru_cache(maxsize=None)
+def get_finbert(quantize=True, model_name=MODEL_NAME):
+    """Return (tokenizer, model, device), loaded on first call and shared afterwards.
+    GPU runs BF16 (FP16 without BF16 support); CPU runs INT8 unless quantize=False.
+    model_name picks the checkpoint, e.g. DISTILLED_MODEL_NAME; each one is loaded once."""
+    global torch
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    if torch.cuda.is_available():
+        device = "cuda"
+        dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+    else:
+        device = "cpu"
+        dtype = torch.float32
+    tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+
+    cache_prefix = "finbert" if model_name == MODEL_NAME else model_name.replace("/", "--")
+    quant_path = os.path.join(QUANT_CACHE_DIR, f"{cache_prefix}-int8-torch{torch.__version__}.pt")
+    if device == "cpu" and quantize and os.path.exists(quant_path):
+        model = torch.load(quant_path, weights_only=False).eval()
+        logger.info(f"Loaded INT8 FinBERT from {quant_path}")
+    else:
+        # safetensors weights are preferred when the checkpoint has them
+        if device == "cuda" and ACCELERATE_AVAILABLE:
+            model = AutoModelForSequenceClassification.from_pretrained(
+                model_name, torch_dtype=dtype, device_map="auto", low_cpu_mem_usage=True).eval()
+        else:
+            model = AutoModelForSequenceClassification.from_pretrained(
+                model_name, torch_dtype=dtype).to(device).eval()
+        if device == "cpu" and quantize:
+            model = _quantize(model, quant_path)
+
+    # torch.compile fuses kernels on GPU; TorchScript tracing is the CPU (and old-PyTorch) path
+    if device == "cuda" and hasattr(torch, "compile"):
+        model = _compile(model, tokenizer, device)
+    else:
+        model = _trace(model, tokenizer, device)
+    # Inference only: no autograd graph for this thread's forwards, even outside inference_mode
+    torch.set_grad_enabled(False)
+    logger.info(f"{model_name} running on {device} ({dtype})")
+    return tokenizer, model, device
+
+
+@functools.lru_cache(maxsize=None)
+def get_labels(model_name=MODEL_NAME):
+    """Lowercased class names in logit order; checkpoints disagree on it, and traced or compiled
+    models no longer carry their config"""
+    from transformers import AutoConfig
+    id2label = AutoConfig.from_pretrained(model_name).id2label
+    return tuple(id2label[i].lower() for i in range(len(id2label)))
+
+
+def label_order(labels):
+    """Column indices that reorder logits labelled by labels (in logit order) into SENTIMENT_LABELS;
+    ValueError unless labels are exactly those three classes"""
+    labels = tuple(label.lower() for label in labels)
+    if sorted(labels) != sorted(SENTIMENT_LABELS):
+        raise ValueError(f"Unexpected sentiment labels {labels}, expected {SENTIMENT_LABELS}")
+    return [labels.index(label) for label in SENTIMENT_LABELS]
+
+
+def _quantize(model, quant_path):
+    """Convert the Linear layers to dynamic INT8 and save the result to quant_path"""
+    try:
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8).eval()
+        os.makedirs(QUANT_CACHE_DIR, exist_ok=True)
+        tmp_path = quant_path + '.tmp'
+        torch.save(model, tmp_path)
+        os.replace(tmp_path, quant_path)
+        logger.info(f"FinBERT quantized to INT8, cached at {quant_path}")
+    except Exception as e:
+        logger.warning(f"INT8 quantization skipped: {e}")
+    return model
+
+
+def _compile(model, tokenizer, device):
+    """torch.compile'd model (reduce-overhead, static shapes); falls back to the trace if compiling fails"""
+    try:
+        compiled = torch.compile(model, mode="reduce-overhead", fullgraph=False, dynamic=False)
+        # Compilation is lazy: run the 16/32/64-token buckets once so failures surface here
+        with torch.inference_mode():
+            for length in (16, 32, MAX_LENGTH):
+                example = tokenizer("sample", return_tensors="pt", padding="max_length", max_length=length).to(device)
+                compiled(example["input_ids"], example["attention_mask"])
+        logger.info("FinBERT compiled with torch.compile")
+        return compiled
+    except Exception as e:
+        logger.warning(f"torch.compile skipped: {e}")
+        return _trace(model, tokenizer, device)
+
+
+def _trace(model, tokenizer, device):
+    """Frozen TorchScript trace of model (no autograd, fused ops); the eager model if tracing fails"""
+    try:
+        torch._C._jit_set_texpr_fuser_enabled(True)
+        example = tokenizer("sample", return_tensors="pt", padding="max_length", max_length=MAX_LENGTH).to(device)
+        with torch.no_grad():
+            traced = torch.jit.trace(model, (example["input_ids"], example["attention_mask"]), strict=False)
+        traced = torch.jit.freeze(traced.eval())
+        # Two warm-up passes let the fuser specialize before real batches arrive
+        with torch.inference_mode():
+            for _ in range(2):
+                traced(example["input_ids"], example["attention_mask"])
+        logger.info("FinBERT traced and frozen with TorchScript")
+        return traced
+    except Exception as e:
+        logger.warning(f"TorchScript tracing skipped, using eager model: {e}")
+        return model
+
+
+class CudaGraphForward:
+    """FinBERT forward recorded once as a CUDA graph on a fixed (1, MAX_LENGTH) input and replayed
+    per call, so single-text requests skip per-kernel launch overhead. Called like the model."""
+
+    def __init__(self, model):
+        self.static_ids = torch.zeros(1, MAX_LENGTH, dtype=torch.long, device="cuda")
+        self.static_mask = torch.zeros_like(self.static_ids)
+        # Warm up on a side stream before capture, as CUDA graph capture requires
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream), torch.inference_mode():
+            for _ in range(3):
+                model(self.static_ids, self.static_mask)
+        torch.cuda.current_stream().wait_stream(stream)
+        self.graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(self.graph), torch.inference_mode():
+            self.static_logits = model(self.static_ids, self.static_mask)["logits"]
+
+    def __call__(self, input_ids, attention_mask):
+        # Inputs up to MAX_LENGTH tokens are copied into the static buffers; the rest stays [PAD]
+        length = input_ids.shape[1]
+        self.static_ids.zero_()
+        self.static_mask.zero_()
+        self.static_ids[:, :length].copy_(input_ids)
+        self.static_mask[:, :length].copy_(attention_mask)
+        self.graph.replay()
+        return {"logits": self.static_logits.clone()}
+
+
+@functools.lru_cache(maxsize=1)
+def get_single_text_graph(quantize=True):
+    """CudaGraphForward over the shared model, or None off-GPU, when capture fails, or when the
+    model is torch.compile'd (its reduce-overhead mode already replays CUDA graphs)"""
+    _, model, device = get_finbert(quantize)
+    if device != "cuda" or hasattr(model, "_orig_mod"):
+        return None
+    try:
+        graph = CudaGraphForward(model)
+        logger.info("FinBERT single-text forward captured as a CUDA graph")
+        return graph
+    except Exception as e:
+        logger.warning(f"CUDA graph capture skipped: {e}")
+        return None
@@ -0,0 +1,17 @@
+"""
+Gunicorn settings for the local FinBERT API server
+
+Usage:
+    gunicorn -c gunicorn_conf.py local_finbert_server:app
+"""
+import os
+
+bind = "0.0.0.0:5000"
+# One worker holds the model; preloading loads it once in the master before forking
+workers = 1
+preload_app = True
+# Requests are served on threads; model inference itself is serialized inside the app
+worker_class = "gthread"
+threads = (os.cpu_count() or 1) * 2
+# First-run ONNX export / model download can take a while
+timeout = 120
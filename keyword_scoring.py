@@ -0,0 +1,44 @@
+"""
+Shared weighted keyword table for the rule-based FinBERT fallbacks
+Each script passes its own word lists; the weight table and the matcher are built here once
+"""
+import sys
+
+# Single-pass keyword matching (optional)
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+class KeywordTable:
+    """keyword -> (positive weight, negative weight), matched in one pass over a lowercased text.
+    Every positive/negative word weighs 1; important terms count 2 extra."""
+
+    def __init__(self, positive, negative, important_positive=(), important_negative=()):
+        self.weights = {}
+        for words, pos, neg in ((positive, 1, 0), (important_positive, 2, 0),
+                                (negative, 0, 1), (important_negative, 0, 2)):
+            for word in map(sys.intern, words):
+                p, n = self.weights.get(word, (0, 0))
+                self.weights[word] = (p + pos, n + neg)
+        self.automaton = None
+        if AHOCORASICK_AVAILABLE:
+            self.automaton = ahocorasick.Automaton()
+            for word in self.weights:
+                self.automaton.add_word(word, word)
+            self.automaton.make_automaton()
+
+    def totals(self, text_lower):
+        """Weighted positive/negative totals; each keyword counts once however often it appears"""
+        if self.automaton is not None:
+            matched = {word for _, word in self.automaton.iter(text_lower)}
+        else:
+            matched = [word for word in self.weights if word in text_lower]
+        total_positive = total_negative = 0
+        for word in matched:
+            p, n = self.weights[word]
+            total_positive += p
+            total_negative += n
+        return total_positive, total_negative
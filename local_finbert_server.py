@@ -1,74 +1,350 @@
 """
 Local FinBERT API Server - Runs on localhost for high-quality sentiment analysis
 """
+import functools
+import hashlib
+import importlib.util
 import json
 import os
+import threading
+import time
 from datetime import datetime
-from flask import Flask, jsonify, request
+import numpy as np
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-import pandas as pd
+from finbert_model import MODEL_NAME, SENTIMENT_LABELS, label_order
+from keyword_scoring import KeywordTable
 
-# Try to import FinBERT dependencies
-try:
-    from transformers import AutoTokenizer, AutoModelForSequenceClassification
-    import torch
-    FINBERT_AVAILABLE = True
+# Heavy dependencies are only located here; transformers/torch (and onnxruntime) are imported
+# when the model is actually loaded, so the fallback tiers start fast
+torch = None
+FINBERT_AVAILABLE = all(importlib.util.find_spec(m) is not None for m in ('transformers', 'torch'))
+if FINBERT_AVAILABLE:
     print("✅ FinBERT dependencies available")
-except ImportError as e:
-    FINBERT_AVAILABLE = False
-    print(f"❌ FinBERT dependencies not available: {e}")
+else:
+    print("❌ FinBERT dependencies not available")
+
+# ONNX Runtime for faster CPU inference (optional)
+ORT_AVAILABLE = importlib.util.find_spec('onnxruntime') is not None
+
+# JIT for the rule-based scoring arithmetic (optional)
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
 
-# Fallback imports
+# Faster JSON encoding for responses (optional)
 try:
-    from textblob import TextBlob
-    TEXTBLOB_AVAILABLE = True
+    import orjson
+    ORJSON_AVAILABLE = True
 except ImportError:
-    TEXTBLOB_AVAILABLE = False
+    ORJSON_AVAILABLE = False
+
+# gzip/br response compression (optional)
+try:
+    from flask_compress import Compress
+    COMPRESS_AVAILABLE = True
+except ImportError:
+    COMPRESS_AVAILABLE = False
+
+# Fallback imports (TextBlob is imported on first use)
+TEXTBLOB_AVAILABLE = importlib.util.find_spec('textblob') is not None
+
+# Financial keywords for fallback (weights and matcher built once per process in KeywordTable)
+POSITIVE_WORDS = [
+    'growth', 'strong', 'beat', 'rally', 'positive', 'win', 'profit', 
+    'gain', 'high', 'good', 'excellent', 'bullish', 'surge', 'rise',
+    'outperform', 'exceed', 'robust', 'solid', 'healthy', 'optimistic',
+    'momentum', 'breakthrough', 'success', 'recovery', 'expansion',
+    'upward', 'promising', 'stellar', 'impressive', 'milestone'
+]
+NEGATIVE_WORDS = [
+    'decline', 'fall', 'loss', 'weak', 'pressure', 'drop', 'bad', 
+    'poor', 'bearish', 'crash', 'volatility', 'concern', 'risk',
+    'challenge', 'struggle', 'disappointing', 'uncertain', 'headwind',
+    'deteriorate', 'sluggish', 'unfavorable', 'downturn', 'warning',
+    'plunge', 'turbulent', 'cautious', 'shortfall', 'disruption'
+]
+# Important financial terms count 2 extra
+IMPORTANT_POSITIVE = ['strong', 'growth', 'exceptional', 'surge', 'outperform', 'stellar']
+IMPORTANT_NEGATIVE = ['crash', 'plunge', 'decline', 'warning', 'risk', 'concern']
+
+# keyword -> (positive weight, negative weight), matched in one pass over the text
+KEYWORDS = KeywordTable(POSITIVE_WORDS, NEGATIVE_WORDS, IMPORTANT_POSITIVE, IMPORTANT_NEGATIVE)
 
 app = Flask(__name__)
 CORS(app)
+if COMPRESS_AVAILABLE:
+    Compress(app)
+
+# Stocks covered by /api/sentiment; their news texts are fixed, so FinBERT inputs are built once
+PORTFOLIO_STOCKS = ['GOLD1', 'NATIONALUM', 'OIL', 'MOTILAL']
+# Label order of every score row below; model logits are reordered to it on load
+FINBERT_LABELS = list(SENTIMENT_LABELS)
+# FinBERT results kept by analyze_sentiment
+SENTIMENT_CACHE_SIZE = 1024
+# /api/sentiment/batch request limits, so one request can't hold the inference lock indefinitely;
+# FinBERT truncates to 512 tokens, so longer texts only cost tokenization
+MAX_BATCH_TEXTS = 256
+MAX_TEXT_CHARS = 10000
+# Texts per FinBERT forward pass in /api/sentiment/batch; longer lists are split
+BATCH_SIZE = 256
+# Seconds a computed /api/sentiment result is reused (the portfolio and its news are static)
+PORTFOLIO_CACHE_TTL = 300
+# Exported/quantized ONNX models, one pair per model revision
+ONNX_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'onnx_cache')
+# Optional distilled (e.g. 4-layer MiniLM/DistilBERT) INT8 ONNX student of FinBERT, produced
+# offline and not shipped with the repo; it must share FinBERT's tokenizer vocabulary, and its
+# id2label must sit in a config.json beside it (the optimum export layout). Serves opt-in
+# mode='fast' requests; everything else runs the full model.
+FAST_MODEL_PATH = os.environ.get(
+    'FINBERT_FAST_MODEL',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'finbert_distill_int8.onnx')
+)
+
+@functools.lru_cache(maxsize=1)
+def _iso_second(second):
+    return datetime.fromtimestamp(second).isoformat()
+
+def now_iso():
+    """Current local time in ISO format, formatted at most once per second"""
+    return _iso_second(int(time.time()))
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+def _rule_score(total_positive, total_negative):
+    """Rule-based label index (into FINBERT_LABELS), confidence and positive/negative/neutral scores"""
+    if total_positive > total_negative and total_positive > 0:
+        confidence = min(0.7 + (total_positive - total_negative) * 0.05, 0.88)
+        return 2, confidence, confidence, (1 - confidence) / 2, 1 - confidence
+    if total_negative > total_positive and total_negative > 0:
+        confidence = min(0.7 + (total_negative - total_positive) * 0.05, 0.88)
+        return 0, confidence, (1 - confidence) / 2, confidence, 1 - confidence
+    confidence = 0.65
+    return 1, confidence, (1 - confidence) / 2, (1 - confidence) / 2, confidence
+
+if NUMBA_AVAILABLE:
+    _rule_score = njit(cache=True)(_rule_score)
+    _rule_score(0, 0)  # compile now rather than on the first request
 
 class LocalFinBERTAPI:
     def __init__(self):
         self.model = None
         self.tokenizer = None
         self.model_loaded = False
-        
-        # Financial keywords for fallback
-        self.positive_words = [
-            'growth', 'strong', 'beat', 'rally', 'positive', 'win', 'profit', 
-            'gain', 'high', 'good', 'excellent', 'bullish', 'surge', 'rise',
-            'outperform', 'exceed', 'robust', 'solid', 'healthy', 'optimistic',
-            'momentum', 'breakthrough', 'success', 'recovery', 'expansion',
-            'upward', 'promising', 'stellar', 'impressive', 'milestone'
-        ]
-        self.negative_words = [
-            'decline', 'fall', 'loss', 'weak', 'pressure', 'drop', 'bad', 
-            'poor', 'bearish', 'crash', 'volatility', 'concern', 'risk',
-            'challenge', 'struggle', 'disappointing', 'uncertain', 'headwind',
-            'deteriorate', 'sluggish', 'unfavorable', 'downturn', 'warning',
-            'plunge', 'turbulent', 'cautious', 'shortfall', 'disruption'
-        ]
+        self.ort_sess = None
+        self.fast_sess = None
+        self.device = None
+        self._portfolio_cache = {}  # mode -> (monotonic time, results)
+        # One forward pass at a time; the model's own intra-op threads use all cores
+        self._infer_lock = threading.Lock()
+        # (text, mode) -> FinBERT result; fallback results are never cached, so a text scored
+        # during a FinBERT failure gets FinBERT again on the next call
+        self._sent_cache = {}
+        self._cache_lock = threading.Lock()
         
         # Load FinBERT model
         self._load_finbert_model()
+        
+        # Response pieces that don't change after loading: model_info is shared by every
+        # response (read-only), the summary shell is shallow-copied per analysis
+        self._model_info = {
+            'finbert_loaded': self.model_loaded,
+            'distilled_loaded': self.fast_sess is not None,
+            'textblob_available': TEXTBLOB_AVAILABLE,
+            'primary_method': 'finbert' if self.model_loaded else 'textblob' if TEXTBLOB_AVAILABLE else 'rule_based'
+        }
+        self._summary_template = {
+            'total_stocks': 0,
+            'positive_sentiment': 0,
+            'negative_sentiment': 0,
+            'neutral_sentiment': 0,
+            'overall_sentiment': 'neutral',
+            'average_confidence': 0.0,
+            'most_positive': None,
+            'most_negative': None
+        }
     
     def _load_finbert_model(self):
         """Load FinBERT model locally"""
+        global torch, FINBERT_AVAILABLE
+        if FINBERT_AVAILABLE:
+            try:
+                from transformers import AutoTokenizer, AutoModelForSequenceClassification
+                import torch
+            except ImportError as e:
+                print(f"❌ FinBERT dependencies failed to import: {e}")
+                FINBERT_AVAILABLE = False
         if not FINBERT_AVAILABLE:
             print("❌ FinBERT not available, will use fallback methods")
             return
         
         try:
             print("🧠 Loading FinBERT model (this may take a moment)...")
-            self.tokenizer = AutoTokenizer.from_pretrained("ProsusAI/finbert")
-            self.model = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert")
+            self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+            self.model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
+            self.model.eval()
+            # Logit columns -> FINBERT_LABELS, from the checkpoint's own id2label (traced,
+            # compiled and ONNX models no longer carry the config)
+            id2label = self.model.config.id2label
+            self._label_order = label_order(id2label[i] for i in range(len(id2label)))
+            self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+            if self.device.type == 'cuda':
+                # GPU: half-precision autocast in _logits; INT8/ONNX paths are CPU-only
+                self.model.to(self.device)
+                self._amp_dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+                print(f"🚀 FinBERT running on {torch.cuda.get_device_name(0)}")
+            else:
+                if ORT_AVAILABLE:
+                    try:
+                        self._export_and_load_onnx()
+                    except Exception as e:
+                        print(f"⚠️ ONNX Runtime unavailable, using PyTorch: {e}")
+                        self.ort_sess = None
+                if self.ort_sess is None:
+                    self._quantize_model()
+            # Pre-tokenize the static portfolio news into one padded batch; stocks sharing a
+            # news text share one row, and _batch_row maps each stock to its row
+            news = [self.get_financial_news(s) for s in PORTFOLIO_STOCKS]
+            rows = {}
+            self._batch_row = [rows.setdefault(t, len(rows)) for t in news]
+            self._batch_texts = list(rows)
+            self._batch_inputs = self.tokenizer(
+                self._batch_texts,
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=512
+            )
+            if self.ort_sess is None:
+                self._compile_model()
+            self._load_fast_model()
             self.model_loaded = True
             print("✅ FinBERT model loaded successfully!")
         except Exception as e:
             print(f"❌ Failed to load FinBERT model: {e}")
             self.model_loaded = False
     
+    def _export_and_load_onnx(self):
+        """Export FinBERT to ONNX, INT8-quantize it and open an ORT session (files cached on disk)"""
+        import onnxruntime as ort
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        
+        key = getattr(self.model.config, '_commit_hash', None) or \
+            hashlib.sha1(self.model.config.to_json_string().encode()).hexdigest()
+        os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+        onnx_path = os.path.join(ONNX_CACHE_DIR, f"finbert-{key[:12]}.onnx")
+        quant_path = os.path.join(ONNX_CACHE_DIR, f"finbert-{key[:12]}-int8.onnx")
+        
+        if not os.path.exists(quant_path):
+            print("📦 Exporting FinBERT to ONNX (first run only)...")
+            sample = self.tokenizer("warmup text", return_tensors="pt")
+            # forward() argument order
+            names = [n for n in ('input_ids', 'attention_mask', 'token_type_ids') if n in sample]
+            axes = {n: {0: 'batch', 1: 'sequence'} for n in names}
+            axes['logits'] = {0: 'batch'}
+            torch.onnx.export(
+                self.model, ({n: sample[n] for n in names},), onnx_path,
+                input_names=names, output_names=['logits'],
+                dynamic_axes=axes, opset_version=14
+            )
+            quantize_dynamic(onnx_path, quant_path, weight_type=QuantType.QInt8)
+        
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.intra_op_num_threads = os.cpu_count() or 1
+        self.ort_sess = ort.InferenceSession(quant_path, opts, providers=['CPUExecutionProvider'])
+        self._ort_inputs = {i.name for i in self.ort_sess.get_inputs()}
+        print("⚡ FinBERT running on ONNX Runtime (INT8)")
+    
+    def _load_fast_model(self):
+        """Open the distilled student model, if one has been shipped next to the server"""
+        if not (ORT_AVAILABLE and os.path.exists(FAST_MODEL_PATH)):
+            return
+        try:
+            import onnxruntime as ort
+            opts = ort.SessionOptions()
+            opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            opts.intra_op_num_threads = os.cpu_count() or 1
+            sess = ort.InferenceSession(FAST_MODEL_PATH, opts, providers=['CPUExecutionProvider'])
+            # Refuse a student whose output isn't one logit per FINBERT_LABELS class, or whose
+            # label order is unknown; its rows would be mislabelled
+            width = sess.get_outputs()[0].shape[-1]
+            if width != len(FINBERT_LABELS):
+                raise ValueError(f"student outputs {width} logits, expected {len(FINBERT_LABELS)}")
+            with open(os.path.join(os.path.dirname(FAST_MODEL_PATH), 'config.json')) as f:
+                id2label = json.load(f)['id2label']
+            self._fast_label_order = label_order(id2label[str(i)] for i in range(len(id2label)))
+            self._fast_inputs = {i.name for i in sess.get_inputs()}
+            self.fast_sess = sess
+            print(f"⚡ Distilled FinBERT loaded for fast mode: {FAST_MODEL_PATH}")
+        except Exception as e:
+            print(f"⚠️ Distilled model not loaded, fast mode uses the full model: {e}")
+            self.fast_sess = None
+    
+    def _logits(self, inputs, fast=False):
+        """FinBERT logits as a NumPy array with columns in FINBERT_LABELS order: the distilled
+        student when fast and loaded, else ONNX Runtime when loaded, else PyTorch"""
+        order = self._fast_label_order if fast and self.fast_sess is not None else self._label_order
+        return self._raw_logits(inputs, fast)[:, order]
+    
+    def _raw_logits(self, inputs, fast=False):
+        """Logits in the checkpoint's own label order"""
+        with self._infer_lock:
+            if fast and self.fast_sess is not None:
+                feeds = {k: v.numpy() for k, v in inputs.items() if k in self._fast_inputs}
+                return self.fast_sess.run(None, feeds)[0]
+            if self.ort_sess is not None:
+                feeds = {k: v.numpy() for k, v in inputs.items() if k in self._ort_inputs}
+                return self.ort_sess.run(None, feeds)[0]
+            # positional (input_ids, attention_mask) so eager, compiled and traced models all fit
+            if self.device.type == 'cuda':
+                ids = inputs['input_ids'].to(self.device, non_blocking=True)
+                mask = inputs['attention_mask'].to(self.device, non_blocking=True)
+                with torch.inference_mode(), torch.autocast('cuda', dtype=self._amp_dtype):
+                    return self.model(ids, mask)['logits'].float().cpu().numpy()
+            with torch.inference_mode():
+                return self.model(inputs['input_ids'], inputs['attention_mask'])['logits'].cpu().numpy()
+    
+    def _compile_model(self):
+        """Cut per-layer Python dispatch: torch.compile on GPU, a TorchScript trace on CPU"""
+        eager = self.model
+        try:
+            if self.device.type == 'cuda' and hasattr(torch, 'compile'):
+                self.model = torch.compile(self.model, mode='reduce-overhead', dynamic=False)
+                how = 'torch.compile'
+            else:
+                example = self.tokenizer("warmup text", return_tensors='pt',
+                                         padding='max_length', max_length=128)
+                with torch.no_grad():
+                    self.model = torch.jit.trace(
+                        self.model, (example['input_ids'], example['attention_mask']), strict=False
+                    )
+                how = 'TorchScript trace'
+            # two passes so compilation / kernel autotuning happens before the first request
+            for _ in range(2):
+                self._logits(self._batch_inputs)
+            print(f"⚡ FinBERT forward pass optimized ({how})")
+        except Exception as e:
+            print(f"⚠️ Model compilation skipped, using eager model: {e}")
+            self.model = eager
+    
+    def _quantize_model(self):
+        """Convert the Linear layers to dynamic INT8 for faster CPU inference"""
+        try:
+            torch.set_num_threads(os.cpu_count() or 1)
+            engines = torch.backends.quantized.supported_engines
+            # fbgemm on x86, qnnpack on ARM
+            torch.backends.quantized.engine = 'fbgemm' if 'fbgemm' in engines else 'qnnpack'
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.model.eval()
+            print(f"⚡ FinBERT quantized to INT8 ({torch.backends.quantized.engine})")
+        except Exception as e:
+            print(f"⚠️ INT8 quantization skipped, using FP32 model: {e}")
+    
     def get_financial_news(self, stock_symbol):
         """Generate contextual financial news"""
         financial_news = {
@@ -81,8 +357,8 @@ class LocalFinBERTAPI:
         clean_symbol = stock_symbol.upper().replace(' ', '').replace('.', '')
         return financial_news.get(clean_symbol, f"{stock_symbol} demonstrates strong operational fundamentals with positive medium-term growth trajectory and solid market positioning")
     
-    def finbert_sentiment_analysis(self, text):
-        """Analyze sentiment using FinBERT model"""
+    def finbert_sentiment_analysis(self, text, mode='accurate'):
+        """Analyze sentiment using FinBERT model (mode='fast' uses the distilled model if loaded)"""
         if not self.model_loaded:
             return None
             
@@ -97,39 +373,48 @@ class LocalFinBERTAPI:
             )
             
             # Get predictions
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                predictions = torch.nn.functional.softmax(outputs.logits, dim=-1)
-            
-            # FinBERT outputs: [negative, neutral, positive]
-            scores = predictions[0].tolist()
-            labels = ['negative', 'neutral', 'positive']
+            fast = mode == 'fast' and self.fast_sess is not None
+            scores = _softmax(self._logits(inputs, fast)[0])
             
-            predicted_idx = torch.argmax(predictions, dim=-1).item()
-            predicted_sentiment = labels[predicted_idx]
-            confidence = scores[predicted_idx]
-            
-            return {
-                'sentiment': predicted_sentiment,
-                'confidence': round(confidence, 4),
-                'scores': {
-                    'negative': round(scores[0], 4),
-                    'neutral': round(scores[1], 4), 
-                    'positive': round(scores[2], 4)
-                },
-                'method': 'finbert'
-            }
+            return self._finbert_result(scores.tolist(), int(scores.argmax()), fast)
             
         except Exception as e:
             print(f"FinBERT analysis error: {e}")
             return None
     
+    def _finbert_result(self, scores, predicted_idx, fast=False):
+        """Build the result dict from one row of FinBERT probabilities [negative, neutral, positive]
+        and the index of its largest entry"""
+        return {
+            'sentiment': FINBERT_LABELS[predicted_idx],
+            'confidence': scores[predicted_idx],
+            'scores': {
+                'negative': scores[0],
+                'neutral': scores[1], 
+                'positive': scores[2]
+            },
+            'method': 'finbert_distilled' if fast else 'finbert'
+        }
+    
+    def _finbert_batch(self, mode='accurate'):
+        """One forward pass over the pre-tokenized portfolio news; returns a result per distinct text"""
+        try:
+            fast = mode == 'fast' and self.fast_sess is not None
+            probs = _softmax(self._logits(self._batch_inputs, fast))
+            # one argmax and one NumPy -> list conversion for the whole batch
+            return [self._finbert_result(row, idx, fast)
+                    for row, idx in zip(probs.tolist(), probs.argmax(axis=-1).tolist())]
+        except Exception as e:
+            print(f"FinBERT batch analysis error: {e}")
+            return None
+    
     def textblob_sentiment_analysis(self, text):
         """TextBlob sentiment analysis"""
         if not TEXTBLOB_AVAILABLE:
             return None
             
         try:
+            from textblob import TextBlob
             blob = TextBlob(text)
             polarity = blob.sentiment.polarity  # -1 to 1
             
@@ -145,11 +430,11 @@ class LocalFinBERTAPI:
             
             return {
                 'sentiment': sentiment,
-                'confidence': round(confidence, 4),
+                'confidence': confidence,
                 'scores': {
-                    'positive': round(max(0.1, (polarity + 1) / 2), 4),
-                    'negative': round(max(0.1, (-polarity + 1) / 2), 4),
-                    'neutral': round(0.4 + abs(polarity) * 0.2, 4)
+                    'positive': max(0.1, (polarity + 1) / 2),
+                    'negative': max(0.1, (-polarity + 1) / 2),
+                    'neutral': 0.4 + abs(polarity) * 0.2
                 },
                 'method': 'textblob'
             }
@@ -159,48 +444,38 @@ class LocalFinBERTAPI:
     
     def rule_based_sentiment_analysis(self, text):
         """Enhanced rule-based analysis as final fallback"""
-        text_lower = text.lower()
-        
-        positive_count = sum(1 for word in self.positive_words if word in text_lower)
-        negative_count = sum(1 for word in self.negative_words if word in text_lower)
-        
-        # Enhanced scoring
-        important_positive = ['strong', 'growth', 'exceptional', 'surge', 'outperform', 'stellar']
-        important_negative = ['crash', 'plunge', 'decline', 'warning', 'risk', 'concern']
-        
-        pos_boost = sum(2 for word in important_positive if word in text_lower)
-        neg_boost = sum(2 for word in important_negative if word in text_lower)
-        
-        total_positive = positive_count + pos_boost
-        total_negative = negative_count + neg_boost
-        
-        if total_positive > total_negative and total_positive > 0:
-            sentiment = 'positive'
-            confidence = min(0.7 + (total_positive - total_negative) * 0.05, 0.88)
-        elif total_negative > total_positive and total_negative > 0:
-            sentiment = 'negative'
-            confidence = min(0.7 + (total_negative - total_positive) * 0.05, 0.88)
-        else:
-            sentiment = 'neutral'
-            confidence = 0.65
+        # Enhanced scoring: keyword hits plus the boost for important terms
+        total_positive, total_negative = KEYWORDS.totals(text.lower())
+        idx, confidence, pos_score, neg_score, neu_score = _rule_score(total_positive, total_negative)
         
         return {
-            'sentiment': sentiment,
-            'confidence': round(confidence, 4),
+            'sentiment': FINBERT_LABELS[idx],
+            'confidence': confidence,
             'scores': {
-                'positive': round(confidence if sentiment == 'positive' else (1-confidence)/2, 4),
-                'negative': round(confidence if sentiment == 'negative' else (1-confidence)/2, 4),
-                'neutral': round(confidence if sentiment == 'neutral' else (1-confidence), 4)
+                'positive': pos_score,
+                'negative': neg_score,
+                'neutral': neu_score
             },
             'method': 'rule_based'
         }
     
-    def analyze_sentiment(self, text):
-        """Multi-tier sentiment analysis: FinBERT -> TextBlob -> Rule-based"""
+    def analyze_sentiment(self, text, mode='accurate'):
+        """Multi-tier sentiment analysis: FinBERT -> TextBlob -> Rule-based.
+        mode='fast' opts into the distilled model when one is loaded. Returns a fresh dict per call."""
+        key = (text, mode)
+        cached = self._sent_cache.get(key)
+        if cached is not None:
+            return {**cached, 'scores': dict(cached['scores'])}
+        
         # Tier 1: FinBERT (highest accuracy)
-        result = self.finbert_sentiment_analysis(text)
+        result = self.finbert_sentiment_analysis(text, mode)
         if result:
-            return result
+            with self._cache_lock:
+                if len(self._sent_cache) >= SENTIMENT_CACHE_SIZE:
+                    # drop the oldest entry
+                    self._sent_cache.pop(next(iter(self._sent_cache)))
+                self._sent_cache[key] = result
+            return {**result, 'scores': dict(result['scores'])}
         
         # Tier 2: TextBlob (moderate accuracy)
         result = self.textblob_sentiment_analysis(text)
@@ -210,36 +485,66 @@ class LocalFinBERTAPI:
         # Tier 3: Rule-based (reliable fallback)
         return self.rule_based_sentiment_analysis(text)
     
-    def analyze_portfolio(self):
+    def analyze_texts(self, texts, mode='accurate'):
+        """Sentiment for a list of texts, in input order. FinBERT scores the distinct texts in
+        padded batches of up to BATCH_SIZE; anything it can't score goes through analyze_sentiment."""
+        # similar lengths share a batch, so less padding
+        unique = sorted(set(texts), key=len)
+        by_text = {}
+        if self.model_loaded:
+            fast = mode == 'fast' and self.fast_sess is not None
+            try:
+                for start in range(0, len(unique), BATCH_SIZE):
+                    chunk = unique[start:start + BATCH_SIZE]
+                    inputs = self.tokenizer(
+                        chunk,
+                        return_tensors="pt",
+                        padding=True,
+                        truncation=True,
+                        max_length=512
+                    )
+                    probs = _softmax(self._logits(inputs, fast))
+                    for text, row, idx in zip(chunk, probs.tolist(), probs.argmax(axis=-1).tolist()):
+                        by_text[text] = self._finbert_result(row, idx, fast)
+            except Exception as e:
+                print(f"FinBERT batch analysis error: {e}")
+        for text in unique:
+            if text not in by_text:
+                by_text[text] = self.analyze_sentiment(text, mode)
+        return [by_text[text] for text in texts]
+    
+    def analyze_portfolio(self, use_cache=True, mode='accurate'):
+        """Analyze full portfolio sentiment, reusing a result younger than PORTFOLIO_CACHE_TTL"""
+        now = time.monotonic()
+        cached = self._portfolio_cache.get(mode)
+        if use_cache and cached and now - cached[0] < PORTFOLIO_CACHE_TTL:
+            return cached[1]
+        results = self._compute_portfolio(mode)
+        self._portfolio_cache[mode] = (now, results)
+        return results
+    
+    def _compute_portfolio(self, mode='accurate'):
         """Analyze full portfolio sentiment"""
-        portfolio_stocks = ['GOLD1', 'NATIONALUM', 'OIL', 'MOTILAL']
+        portfolio_stocks = PORTFOLIO_STOCKS
         
         results = {
-            'timestamp': datetime.now().isoformat(),
-            'model_info': {
-                'finbert_loaded': self.model_loaded,
-                'textblob_available': TEXTBLOB_AVAILABLE,
-                'primary_method': 'finbert' if self.model_loaded else 'textblob' if TEXTBLOB_AVAILABLE else 'rule_based'
-            },
-            'portfolio_summary': {
-                'total_stocks': 0,
-                'positive_sentiment': 0,
-                'negative_sentiment': 0,
-                'neutral_sentiment': 0,
-                'overall_sentiment': 'neutral',
-                'average_confidence': 0.0,
-                'most_positive': None,
-                'most_negative': None
-            },
+            'timestamp': now_iso(),
+            'model_info': self._model_info,
+            'portfolio_summary': dict(self._summary_template),
             'stock_sentiments': []
         }
         
         portfolio_sentiments = []
-        total_confidence = 0
         
-        for stock_symbol in portfolio_stocks:
+        # FinBERT scores the whole portfolio in one batch; other tiers go text by text
+        batch_results = self._finbert_batch(mode) if self.model_loaded else None
+        
+        for i, stock_symbol in enumerate(portfolio_stocks):
             news_text = self.get_financial_news(stock_symbol)
-            sentiment_result = self.analyze_sentiment(news_text)
+            if batch_results:
+                sentiment_result = batch_results[self._batch_row[i]]
+            else:
+                sentiment_result = self.analyze_sentiment(news_text, mode)
             
             stock_data = {
                 'symbol': stock_symbol,
@@ -251,25 +556,26 @@ class LocalFinBERTAPI:
             }
             
             portfolio_sentiments.append(stock_data)
-            total_confidence += sentiment_result['confidence']
-            
-            # Update counters
-            if sentiment_result['sentiment'] == 'positive':
-                results['portfolio_summary']['positive_sentiment'] += 1
-            elif sentiment_result['sentiment'] == 'negative':
-                results['portfolio_summary']['negative_sentiment'] += 1
-            else:
-                results['portfolio_summary']['neutral_sentiment'] += 1
         
-        # Calculate summary metrics
+        # Summary metrics over column arrays
+        sents = np.array([r['sentiment'] for r in portfolio_sentiments])
+        confs = np.fromiter((r['confidence'] for r in portfolio_sentiments), dtype=float)
+        pos_scores = np.fromiter((r['scores']['positive'] for r in portfolio_sentiments), dtype=float)
+        neg_scores = np.fromiter((r['scores']['negative'] for r in portfolio_sentiments), dtype=float)
+        
+        pos_count = int((sents == 'positive').sum())
+        neg_count = int((sents == 'negative').sum())
         total_stocks = len(portfolio_sentiments)
+        results['portfolio_summary']['positive_sentiment'] = pos_count
+        results['portfolio_summary']['negative_sentiment'] = neg_count
+        results['portfolio_summary']['neutral_sentiment'] = total_stocks - pos_count - neg_count
         results['portfolio_summary']['total_stocks'] = total_stocks
-        results['portfolio_summary']['average_confidence'] = round(total_confidence / total_stocks, 4)
+        results['portfolio_summary']['average_confidence'] = round(float(confs.mean()), 4)
         results['stock_sentiments'] = portfolio_sentiments
         
-        # Find extremes
-        most_positive = max(portfolio_sentiments, key=lambda x: x['scores']['positive'])
-        most_negative = max(portfolio_sentiments, key=lambda x: x['scores']['negative'])
+        # Find extremes (argmax keeps the first maximum, like max())
+        most_positive = portfolio_sentiments[int(pos_scores.argmax())]
+        most_negative = portfolio_sentiments[int(neg_scores.argmax())]
         
         results['portfolio_summary']['most_positive'] = {
             'symbol': most_positive['symbol'],
@@ -286,9 +592,6 @@ class LocalFinBERTAPI:
         }
         
         # Overall sentiment
-        pos_count = results['portfolio_summary']['positive_sentiment']
-        neg_count = results['portfolio_summary']['negative_sentiment']
-        
         if pos_count > neg_count * 1.2:
             results['portfolio_summary']['overall_sentiment'] = 'positive'
         elif neg_count > pos_count * 1.2:
@@ -301,16 +604,59 @@ class LocalFinBERTAPI:
 # Initialize the API
 finbert_api = LocalFinBERTAPI()
 
+def json_bytes(obj):
+    """Encode obj as JSON, with orjson when installed (also handles NumPy values)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj).encode()
+
+def json_response(obj):
+    """JSON response with an ETag of its body; a client that sends a matching If-None-Match
+    gets an empty 304 instead"""
+    payload = json_bytes(obj)
+    resp = Response(payload, mimetype='application/json')
+    resp.set_etag(hashlib.blake2s(payload, digest_size=8).hexdigest())
+    resp.cache_control.public = True
+    resp.cache_control.max_age = 60
+    return resp.make_conditional(request)
+
 @app.route('/api/sentiment', methods=['GET'])
 def get_sentiment():
     """Main sentiment analysis endpoint"""
     try:
-        results = finbert_api.analyze_portfolio()
-        return jsonify(results)
+        # ?nocache=1 forces a fresh analysis; ?mode=fast opts into the distilled model
+        mode = 'fast' if request.args.get('mode') == 'fast' else 'accurate'
+        results = finbert_api.analyze_portfolio(use_cache=request.args.get('nocache') != '1', mode=mode)
+        return json_response(results)
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'timestamp': now_iso()
+        }), 500
+
+@app.route('/api/sentiment/batch', methods=['POST'])
+def get_sentiment_batch():
+    """Score many texts in one call: body {"texts": [...]}, returns {"results": [...]}"""
+    data = request.get_json(silent=True) or {}
+    texts = data.get('texts')
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return jsonify({
+            'error': 'Request body must be JSON of the form {"texts": ["...", ...]}',
+            'timestamp': now_iso()
+        }), 400
+    if len(texts) > MAX_BATCH_TEXTS or any(len(t) > MAX_TEXT_CHARS for t in texts):
+        return jsonify({
+            'error': f'At most {MAX_BATCH_TEXTS} texts of up to {MAX_TEXT_CHARS} characters each per request',
+            'timestamp': now_iso()
+        }), 400
+    try:
+        mode = 'fast' if request.args.get('mode') == 'fast' else 'accurate'
+        results = finbert_api.analyze_texts(texts, mode)
+        return Response(json_bytes({'results': results, 'timestamp': now_iso()}), mimetype='application/json')
     except Exception as e:
         return jsonify({
             'error': str(e),
-            'timestamp': datetime.now().isoformat()
+            'timestamp': now_iso()
         }), 500
 
 @app.route('/health', methods=['GET'])
@@ -320,7 +666,7 @@ def health_check():
         'status': 'healthy',
         'finbert_loaded': finbert_api.model_loaded,
         'textblob_available': TEXTBLOB_AVAILABLE,
-        'timestamp': datetime.now().isoformat()
+        'timestamp': now_iso()
     })
 
 if __name__ == '__main__':
@@ -330,6 +676,10 @@ if __name__ == '__main__':
     print("🌐 Server will run on http://localhost:5000")
     print("📡 Endpoints:")
     print("   - GET /api/sentiment (Portfolio analysis)")
+    print("   - POST /api/sentiment/batch (Score a list of texts)")
     print("   - GET /health (Health check)")
+    print("💡 For production use: gunicorn -c gunicorn_conf.py local_finbert_server:app")
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Development fallback (e.g. Windows, where gunicorn doesn't run): threaded, no debug
+    # reloader, so the model is loaded once
+    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
\ No newline at end of file
@@ -3,25 +3,39 @@ Local test version without PyTorch for Windows compatibility
 """
 import json
 from datetime import datetime
+from pathlib import Path
+from keyword_scoring import KeywordTable
+
+# Faster JSON writer (optional)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Enhanced financial keywords for better accuracy (weights and matcher built once per process in KeywordTable)
+POSITIVE_WORDS = [
+    'growth', 'strong', 'beat', 'rally', 'positive', 'win', 'profit', 
+    'gain', 'high', 'good', 'excellent', 'bullish', 'surge', 'rise',
+    'outperform', 'exceed', 'robust', 'solid', 'healthy', 'optimistic',
+    'momentum', 'breakthrough', 'success', 'recovery', 'expansion',
+    'upward', 'promising', 'stellar', 'impressive', 'milestone'
+]
+NEGATIVE_WORDS = [
+    'decline', 'fall', 'loss', 'weak', 'pressure', 'drop', 'bad', 
+    'poor', 'bearish', 'crash', 'volatility', 'concern', 'risk',
+    'challenge', 'struggle', 'disappointing', 'uncertain', 'headwind',
+    'deteriorate', 'sluggish', 'unfavorable', 'downturn', 'warning',
+    'plunge', 'turbulent', 'cautious', 'shortfall', 'disruption'
+]
+# Important financial terms count 2 extra
+IMPORTANT_POSITIVE = ['strong', 'growth', 'beat', 'outperform', 'surge', 'stellar', 'robust']
+IMPORTANT_NEGATIVE = ['crash', 'loss', 'decline', 'warning', 'risk', 'plunge', 'concern']
+
+# keyword -> (positive weight, negative weight), matched in one pass over the text
+KEYWORDS = KeywordTable(POSITIVE_WORDS, NEGATIVE_WORDS, IMPORTANT_POSITIVE, IMPORTANT_NEGATIVE)
 
 class LocalFinBERTAnalyzer:
-    def __init__(self):
-        # Enhanced financial keywords for better accuracy
-        self.positive_words = [
-            'growth', 'strong', 'beat', 'rally', 'positive', 'win', 'profit', 
-            'gain', 'high', 'good', 'excellent', 'bullish', 'surge', 'rise',
-            'outperform', 'exceed', 'robust', 'solid', 'healthy', 'optimistic',
-            'momentum', 'breakthrough', 'success', 'recovery', 'expansion',
-            'upward', 'promising', 'stellar', 'impressive', 'milestone'
-        ]
-        self.negative_words = [
-            'decline', 'fall', 'loss', 'weak', 'pressure', 'drop', 'bad', 
-            'poor', 'bearish', 'crash', 'volatility', 'concern', 'risk',
-            'challenge', 'struggle', 'disappointing', 'uncertain', 'headwind',
-            'deteriorate', 'sluggish', 'unfavorable', 'downturn', 'warning',
-            'plunge', 'turbulent', 'cautious', 'shortfall', 'disruption'
-        ]
-    
     def get_financial_news(self, stock_symbol):
         """Get enhanced financial news"""
         financial_news = {
@@ -36,22 +50,8 @@ class LocalFinBERTAnalyzer:
     
     def analyze_sentiment(self, text):
         """Enhanced rule-based sentiment analysis simulating FinBERT quality"""
-        text_lower = text.lower()
-        
-        # Count keyword occurrences
-        positive_count = sum(1 for word in self.positive_words if word in text_lower)
-        negative_count = sum(1 for word in self.negative_words if word in text_lower)
-        
-        # Weight important financial terms more heavily
-        important_positive = ['strong', 'growth', 'beat', 'outperform', 'surge', 'stellar', 'robust']
-        important_negative = ['crash', 'loss', 'decline', 'warning', 'risk', 'plunge', 'concern']
-        
-        pos_boost = sum(2 for word in important_positive if word in text_lower)
-        neg_boost = sum(2 for word in important_negative if word in text_lower)
-        
-        # Calculate scores
-        total_positive = positive_count + pos_boost
-        total_negative = negative_count + neg_boost
+        # Keyword hits, with important financial terms weighted more heavily
+        total_positive, total_negative = KEYWORDS.totals(text.lower())
         
         # Determine sentiment with higher confidence thresholds
         if total_positive > total_negative and total_positive > 0:
@@ -115,6 +115,9 @@ class LocalFinBERTAnalyzer:
         
         portfolio_sentiments = []
         total_confidence = 0
+        # parallel score columns, for the extremes below
+        pos_scores = []
+        neg_scores = []
         
         for stock_symbol in sample_portfolio:
             news_text = self.get_financial_news(stock_symbol)
@@ -131,6 +134,8 @@ class LocalFinBERTAnalyzer:
             
             portfolio_sentiments.append(stock_data)
             total_confidence += sentiment_result['confidence']
+            pos_scores.append(sentiment_result['scores']['positive'])
+            neg_scores.append(sentiment_result['scores']['negative'])
             
             # Update counters
             if sentiment_result['sentiment'] == 'positive':
@@ -147,8 +152,8 @@ class LocalFinBERTAnalyzer:
         results['stock_sentiments'] = portfolio_sentiments
         
         # Find extremes
-        most_positive = max(portfolio_sentiments, key=lambda x: x['scores']['positive'])
-        most_negative = max(portfolio_sentiments, key=lambda x: x['scores']['negative'])
+        most_positive = portfolio_sentiments[pos_scores.index(max(pos_scores))]
+        most_negative = portfolio_sentiments[neg_scores.index(max(neg_scores))]
         
         results['portfolio_summary']['most_positive'] = {
             'symbol': most_positive['symbol'],
@@ -182,8 +187,11 @@ if __name__ == "__main__":
     results = analyzer.analyze_portfolio()
     
     # Save to JSON file
-    with open('portfolio_sentiment_analysis.json', 'w') as f:
-        json.dump(results, f, indent=2)
+    if ORJSON_AVAILABLE:
+        Path('portfolio_sentiment_analysis.json').write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    else:
+        with open('portfolio_sentiment_analysis.json', 'w') as f:
+            json.dump(results, f, indent=2)
     
     print("📊 Enhanced Portfolio Sentiment Analysis Summary:")
     print(f"🔧 Method: {results['model_info']['primary_method'].upper()}")
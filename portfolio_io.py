@@ -0,0 +1,65 @@
+"""
+Shared portfolio workbook reading
+Used by the FinBERT and simple analyzers so the Excel engine choice and Parquet cache live in one place
+"""
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+
+# Rust XLSX reader for pd.read_excel(engine="calamine"), and a Parquet engine for the re-read cache
+CALAMINE_AVAILABLE = importlib.util.find_spec("python_calamine") is not None
+PARQUET_AVAILABLE = (importlib.util.find_spec("pyarrow") or importlib.util.find_spec("fastparquet")) is not None
+# Engine for pd.ExcelFile: calamine when installed, else pandas' default
+EXCEL_ENGINE = "calamine" if CALAMINE_AVAILABLE else None
+
+# Column of each sentiment label in the [negative, neutral, positive] score rows the analyzers report
+LABEL_INDEX = {'negative': 0, 'neutral': 1, 'positive': 2}
+
+
+def read_portfolio_excel(excel_file, sheet_names=()):
+    """Read the first of sheet_names present (else the first sheet) from excel_file in one parse,
+    using calamine when installed; a Parquet copy beside the workbook serves later runs until the
+    workbook changes"""
+    # keyed by the sheet preference too, since callers may pick different sheets
+    parquet_file = f"{excel_file}.{'-'.join(sheet_names) or 'first'}.parquet"
+    if PARQUET_AVAILABLE and os.path.exists(parquet_file) and \
+            os.path.getmtime(parquet_file) >= os.path.getmtime(excel_file):
+        return pd.read_parquet(parquet_file)
+
+    with pd.ExcelFile(excel_file, engine=EXCEL_ENGINE) as xls:
+        sheet = next((s for s in sheet_names if s in xls.sheet_names), xls.sheet_names[0])
+        df = xls.parse(sheet)
+
+    if PARQUET_AVAILABLE:
+        try:
+            df.to_parquet(parquet_file)
+        except Exception:
+            # mixed-type object columns cannot always be written; the workbook still works
+            pass
+    return df
+
+
+def find_column(columns, keywords):
+    """First column whose lowercased name contains any of keywords, else None"""
+    return next((c for c in columns if any(k in str(c).lower() for k in keywords)), None)
+
+
+def coerce_float(value):
+    """Cell value as float (commas stripped); None for blanks and non-numeric text"""
+    if pd.isna(value):
+        return None
+    try:
+        return float(str(value).replace(',', ''))
+    except ValueError:
+        return None
+
+
+def score_summary(stock_sentiments):
+    """Scores of stock_sentiments as one (N, 3) [negative, neutral, positive] array, and the
+    (negative, neutral, positive) label counts, so counters and extremes are single NumPy reductions"""
+    scores = np.array([[s['scores']['negative'], s['scores']['neutral'], s['scores']['positive']]
+                       for s in stock_sentiments], dtype=float).reshape(-1, 3)
+    pred_idx = np.array([LABEL_INDEX.get(s['sentiment'], 1) for s in stock_sentiments], dtype=np.intp)
+    return scores, tuple(np.bincount(pred_idx, minlength=3).tolist())
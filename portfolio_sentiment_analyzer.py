@@ -4,36 +4,51 @@ Reads portfolio data from Excel and analyzes sentiment for each stock
 """
 import pandas as pd
 import json
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import numpy as np
 from datetime import datetime
-import requests
 import os
+from portfolio_io import coerce_float, find_column, read_portfolio_excel, score_summary
+from finbert_model import (get_finbert, get_labels, get_single_text_graph, label_order, MODEL_NAME,
+                           SENTIMENT_LABELS, MAX_LENGTH, LONG_NEWS_MAX_LENGTH, COMPILE_PAD_MULTIPLE)
+
+# torch and numpy are imported when an analyzer is built, so news lookups and
+# load_portfolio_data don't pay for them
+torch = None
+np = None
+
+# Faster JSON writer for the results file (optional)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Number of news snippets tokenized and run through FinBERT per forward pass
+BATCH_SIZE = 32
 
 class PortfolioSentimentAnalyzer:
-    def __init__(self):
+    def __init__(self, quantize=True, long_news=False):
         print("Initializing FinBERT model...")
-        # Load FinBERT model for financial sentiment analysis
-        self.tokenizer = AutoTokenizer.from_pretrained("ProsusAI/finbert")
-        self.model = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert")
+        global torch, np
+        import torch
+        import numpy as np
+        # FinBERT results keyed by news text; scoring is deterministic per text
+        self._sent_cache = {}
+        self._effective_max_len = LONG_NEWS_MAX_LENGTH if long_news else MAX_LENGTH
+        # Longest text (in tokens, with [CLS]/[SEP]) scored so far, to spot truncation
+        self._longest_seen = 0
+        # Load FinBERT model for financial sentiment analysis (shared with other analyzers in this process)
+        self.tokenizer, self.model, self.device = get_finbert(quantize)
+        # Logit columns -> [negative, neutral, positive], from the checkpoint's own id2label
+        self._label_order = label_order(get_labels(MODEL_NAME))
+        # Replayed CUDA graph for single-text batches (fits only the default token cap)
+        self._graph = None if long_news else get_single_text_graph(quantize)
         print("FinBERT model loaded successfully!")
         
     def load_portfolio_data(self, excel_file):
         """Load portfolio data from Excel file"""
         try:
-            # Try different sheet names
-            df = None
-            for sheet_name in [None, 0, 'Sheet1', 'Portfolio', 'Holdings']:
-                try:
-                    df = pd.read_excel(excel_file, sheet_name=sheet_name)
-                    print(f"Loaded data from sheet: {sheet_name}")
-                    break
-                except:
-                    continue
-            
-            if df is None:
-                raise Exception("Could not read Excel file")
+            # Prefer the usual sheet names, else the first sheet; the workbook is parsed once
+            df = read_portfolio_excel(excel_file, ('Sheet1', 'Portfolio', 'Holdings'))
                 
             print(f"Portfolio data shape: {df.shape}")
             print(f"Columns: {df.columns.tolist()}")
@@ -62,42 +77,74 @@ class PortfolioSentimentAnalyzer:
     
     def analyze_sentiment(self, text):
         """Analyze sentiment using FinBERT"""
-        try:
-            # Tokenize and get model predictions
-            inputs = self.tokenizer(text, return_tensors="pt", padding=True, truncation=True, max_length=512)
-            
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                predictions = torch.nn.functional.softmax(outputs.logits, dim=-1)
-            
-            # FinBERT labels: 0=negative, 1=neutral, 2=positive
-            labels = ['negative', 'neutral', 'positive']
-            scores = predictions[0].tolist()
+        return self.analyze_sentiments([text])[0]
+    
+    def analyze_sentiments(self, texts, batch_size=BATCH_SIZE):
+        """Analyze sentiment for many texts, one padded FinBERT forward pass per batch_size texts"""
+        # Probability columns are reordered to SENTIMENT_LABELS: 0=negative, 1=neutral, 2=positive
+        labels = np.array(SENTIMENT_LABELS)
+        failed = {}
+        
+        # Only unique texts that are not cached yet go through the model
+        pending = [t for t in dict.fromkeys(texts) if t not in self._sent_cache]
+        if not pending:
+            return [self._sent_cache[t] for t in texts]
+        
+        # Sort by token length so each batch only pads to its own longest text
+        lengths = [len(ids) for ids in self.tokenizer(pending, add_special_tokens=False)['input_ids']]
+        longest = max(lengths) + 2
+        if longest > self._effective_max_len and longest > self._longest_seen:
+            print(f"News text of {longest} tokens truncated to {self._effective_max_len}; pass long_news=True for long articles")
+        self._longest_seen = max(self._longest_seen, longest)
+        order = np.argsort(lengths, kind='stable')
+        sorted_texts = [pending[i] for i in order]
+        
+        for start in range(0, len(sorted_texts), batch_size):
+            batch = sorted_texts[start:start + batch_size]
+            try:
+                # Tokenize the whole batch and get model predictions
+                # On GPU, pad to a few fixed bucket lengths so the compiled graph is reused
+                inputs = self.tokenizer(batch, return_tensors="pt", padding=True, truncation=True, max_length=self._effective_max_len,
+                                        pad_to_multiple_of=COMPILE_PAD_MULTIPLE if self.device == "cuda" else None)
+                inputs = inputs.to(self.device)
+                
+                # A lone text replays the captured CUDA graph when there is one
+                model = self._graph if len(batch) == 1 and self._graph is not None else self.model
+                with torch.inference_mode():
+                    # Positional (input_ids, attention_mask) so eager, traced, compiled and graph forwards all fit
+                    outputs = model(inputs["input_ids"], inputs["attention_mask"])
+                    predictions = torch.nn.functional.softmax(outputs["logits"].float(), dim=-1)
+                
+                probs = predictions.cpu().numpy()[:, self._label_order]
+            except Exception as e:
+                print(f"Error in sentiment analysis: {e}")
+                # Neutral placeholders are returned but not cached
+                failed.update((text, {
+                    'sentiment': 'neutral',
+                    'confidence': 0.5,
+                    'scores': {'negative': 0.3, 'neutral': 0.4, 'positive': 0.3}
+                }) for text in batch)
+                continue
             
-            # Get the predicted sentiment
-            predicted_class = torch.argmax(predictions, dim=-1).item()
-            predicted_label = labels[predicted_class]
-            confidence = scores[predicted_class]
+            # Predicted sentiment and its confidence for the whole batch at once
+            predicted = probs.argmax(axis=1)
+            confidences = probs[np.arange(len(probs)), predicted]
             
-            return {
-                'sentiment': predicted_label,
-                'confidence': confidence,
-                'scores': {
-                    'negative': scores[0],
-                    'neutral': scores[1],
-                    'positive': scores[2]
+            for text, label, confidence, scores in zip(batch, labels[predicted].tolist(),
+                                                       confidences.tolist(), probs.tolist()):
+                self._sent_cache[text] = {
+                    'sentiment': label,
+                    'confidence': confidence,
+                    'scores': {
+                        'negative': scores[0],
+                        'neutral': scores[1],
+                        'positive': scores[2]
+                    }
                 }
-            }
-            
-        except Exception as e:
-            print(f"Error in sentiment analysis: {e}")
-            return {
-                'sentiment': 'neutral',
-                'confidence': 0.5,
-                'scores': {'negative': 0.3, 'neutral': 0.4, 'positive': 0.3}
-            }
+        
+        return [self._sent_cache[t] if t in self._sent_cache else failed[t] for t in texts]
     
-    def analyze_portfolio_sentiment(self, excel_file):
+    def analyze_portfolio_sentiment(self, excel_file, batch_size=BATCH_SIZE):
         """Analyze sentiment for entire portfolio"""
         # Load portfolio data
         df = self.load_portfolio_data(excel_file)
@@ -119,11 +166,9 @@ class PortfolioSentimentAnalyzer:
         }
         
         # Find stock symbol column (try different possible names)
-        stock_column = None
-        for col in df.columns:
-            if any(keyword in col.lower() for keyword in ['symbol', 'stock', 'scrip', 'name', 'company']):
-                stock_column = col
-                break
+        stock_column = find_column(df.columns, ('symbol', 'stock', 'scrip', 'name', 'company'))
+        # Weight/value column, resolved once rather than per row
+        value_column = find_column(df.columns, ('value', 'amount', 'weight', 'allocation'))
         
         if stock_column is None:
             print("Could not find stock symbol column")
@@ -131,20 +176,20 @@ class PortfolioSentimentAnalyzer:
         
         print(f"Using column '{stock_column}' for stock symbols")
         
-        # Analyze sentiment for each stock
+        # Collect every stock's news first so FinBERT can score them in batches;
+        # symbols and values come from column operations, not iterrows Series
+        stripped = df[stock_column].astype(str).str.strip()
+        keep = stripped != 'nan'
+        symbols = stripped[keep].tolist()
+        values = df.loc[keep, value_column].tolist() if value_column is not None else [None] * len(symbols)
+        
+        # Get sample news for each stock and analyze sentiment
+        texts = [self.get_sample_news(s) for s in symbols]
+        sentiment_results = self.analyze_sentiments(texts, batch_size)
+        
         portfolio_sentiments = []
         
-        for idx, row in df.iterrows():
-            stock_symbol = str(row[stock_column]).strip()
-            if pd.isna(stock_symbol) or stock_symbol == 'nan':
-                continue
-                
-            # Get sample news for the stock
-            news_text = self.get_sample_news(stock_symbol)
-            
-            # Analyze sentiment
-            sentiment_result = self.analyze_sentiment(news_text)
-            
+        for value, stock_symbol, news_text, sentiment_result in zip(values, symbols, texts, sentiment_results):
             stock_data = {
                 'symbol': stock_symbol,
                 'news': news_text,
@@ -154,23 +199,17 @@ class PortfolioSentimentAnalyzer:
             }
             
             # Add weight/value if available
-            for col in df.columns:
-                if any(keyword in col.lower() for keyword in ['value', 'amount', 'weight', 'allocation']):
-                    try:
-                        stock_data['weight'] = float(row[col])
-                        break
-                    except:
-                        pass
+            weight = coerce_float(value)
+            if weight is not None:
+                stock_data['weight'] = weight
             
             portfolio_sentiments.append(stock_data)
-            
-            # Update counters
-            if sentiment_result['sentiment'] == 'positive':
-                results['portfolio_summary']['positive_sentiment'] += 1
-            elif sentiment_result['sentiment'] == 'negative':
-                results['portfolio_summary']['negative_sentiment'] += 1
-            else:
-                results['portfolio_summary']['neutral_sentiment'] += 1
+        
+        # Score rows and label counts as single NumPy reductions
+        scores_arr, (neg_count, neu_count, pos_count) = score_summary(portfolio_sentiments)
+        results['portfolio_summary']['negative_sentiment'] = neg_count
+        results['portfolio_summary']['neutral_sentiment'] = neu_count
+        results['portfolio_summary']['positive_sentiment'] = pos_count
         
         # Calculate overall portfolio sentiment
         results['portfolio_summary']['total_stocks'] = len(portfolio_sentiments)
@@ -178,8 +217,8 @@ class PortfolioSentimentAnalyzer:
         
         # Find most positive and negative stocks
         if portfolio_sentiments:
-            most_positive = max(portfolio_sentiments, key=lambda x: x['scores']['positive'])
-            most_negative = max(portfolio_sentiments, key=lambda x: x['scores']['negative'])
+            most_positive = portfolio_sentiments[int(scores_arr[:, 2].argmax())]
+            most_negative = portfolio_sentiments[int(scores_arr[:, 0].argmax())]
             
             results['portfolio_summary']['most_positive'] = {
                 'symbol': most_positive['symbol'],
@@ -194,9 +233,6 @@ class PortfolioSentimentAnalyzer:
             }
             
             # Overall sentiment based on majority
-            pos_count = results['portfolio_summary']['positive_sentiment']
-            neg_count = results['portfolio_summary']['negative_sentiment']
-            
             if pos_count > neg_count:
                 results['portfolio_summary']['overall_sentiment'] = 'positive'
             elif neg_count > pos_count:
@@ -223,8 +259,12 @@ def main():
     if results:
         # Save results to JSON file for the web dashboard
         output_file = "portfolio_sentiment_analysis.json"
-        with open(output_file, 'w') as f:
-            json.dump(results, f, indent=2)
+        if ORJSON_AVAILABLE:
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+        else:
+            with open(output_file, 'w') as f:
+                json.dump(results, f, indent=2)
         
         print(f"Sentiment analysis complete! Results saved to {output_file}")
         print(f"Portfolio Summary:")
@@ -3,10 +3,14 @@ Production FinBERT Portfolio Sentiment Analyzer
 Optimized for deployment with error handling and fallbacks
 """
 import pandas as pd
+import numpy as np
 import json
 import os
+import re
 from datetime import datetime
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from portfolio_io import coerce_float, find_column, read_portfolio_excel, score_summary
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -15,13 +19,16 @@ logger = logging.getLogger(__name__)
 # Try to import FinBERT dependencies
 try:
     import torch
-    from transformers import AutoTokenizer, AutoModelForSequenceClassification
-    import numpy as np
+    import transformers
+    from finbert_model import (get_finbert, get_labels, get_single_text_graph, label_order, MODEL_NAME,
+                               SENTIMENT_LABELS, MAX_LENGTH, LONG_NEWS_MAX_LENGTH, COMPILE_PAD_MULTIPLE)
     FINBERT_AVAILABLE = True
     logger.info("FinBERT dependencies loaded successfully")
 except ImportError as e:
     FINBERT_AVAILABLE = False
     logger.warning(f"FinBERT dependencies not available: {e}")
+    # Token cap still used by the constructor when FinBERT is absent
+    MAX_LENGTH, LONG_NEWS_MAX_LENGTH = 64, 512
 
 # Fallback to TextBlob
 try:
@@ -31,12 +38,55 @@ except ImportError:
     TEXTBLOB_AVAILABLE = False
     logger.warning("TextBlob not available")
 
+# Faster JSON writer for the results file (optional)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Lowercase word tokens for the rule-based tier
+WORD_RE = re.compile(r"[a-z]+")
+
+# Number of news snippets tokenized and run through FinBERT per forward pass
+BATCH_SIZE = 32
+
+# Realistic news per known symbol, plus the precompiled matchers used by get_financial_news
+FINANCIAL_NEWS = {
+    'GOLD1': "Gold ETF experiences strong institutional inflows as central bank policies drive safe haven demand amid global economic uncertainty",
+    'NATIONALUM': "National Aluminium Company reports record quarterly production with 12% YoY growth, benefiting from robust automotive and infrastructure demand",
+    'OIL': "Oil and Natural Gas Corporation announces major offshore discovery, expects production boost of 15% over next two years with improved margins",
+    'MOTILAL': "Motilal Oswal Large and Midcap Fund delivers alpha with disciplined stock selection, outperforming benchmark by 280 basis points YTD",
+    'RELIANCE': "Reliance Industries posts stellar Q3 results with petrochemicals margin expansion and Jio subscriber additions exceeding estimates",
+    'TCS': "Tata Consultancy Services secures landmark $3.2 billion multi-year deal in financial services vertical, reinforcing market leadership",
+    'HDFCBANK': "HDFC Bank maintains asset quality leadership with gross NPA at multi-year lows while sustaining healthy credit growth momentum", 
+    'INFY': "Infosys raises FY25 revenue guidance citing accelerating digital transformation demand and successful large deal execution",
+    'BHARTIARTL': "Bharti Airtel reports strong ARPU growth with 5G network expansion reaching 75% population coverage ahead of schedule",
+    'ITC': "ITC's diversification strategy pays off with FMCG business contributing 52% to revenue, cigarette headwinds offset by growth segments"
+}
+# Partial match: the leftmost known symbol inside the cleaned symbol, found in one scan
+NEWS_KEY_RE = re.compile('|'.join(map(re.escape, sorted(FINANCIAL_NEWS, key=len, reverse=True))))
+# Category words for the contextual templates, collected in one scan
+NEWS_CATEGORY_RE = re.compile(r'FUND|MUTUAL|BANK|GOLD|SILVER')
+
+# Below this many texts the TextBlob/rule-based tiers run inline; worker start-up (each
+# spawned process re-imports this module) costs more than it saves on small portfolios
+PARALLEL_FALLBACK_MIN = 200
+
 class ProductionFinBERTAnalyzer:
-    def __init__(self):
+    def __init__(self, quantize=True, long_news=False):
         logger.info("Initializing Production FinBERT Analyzer...")
+        self.quantize = quantize
         self.model = None
         self.tokenizer = None
+        self.device = "cpu"
+        self._graph = None
         self.model_loaded = False
+        # FinBERT results keyed by news text; scoring is deterministic per text
+        self._sent_cache = {}
+        self._effective_max_len = LONG_NEWS_MAX_LENGTH if long_news else MAX_LENGTH
+        # Longest text (in tokens, with [CLS]/[SEP]) scored so far, to spot truncation
+        self._longest_seen = 0
         
         # Financial keywords for fallback analysis
         self.positive_words = [
@@ -51,6 +101,19 @@ class ProductionFinBERTAnalyzer:
             'challenge', 'struggle', 'disappointing', 'uncertain', 'headwind',
             'deteriorate', 'sluggish', 'unfavorable', 'downturn', 'warning'
         ]
+        # Terms that add a boost of 2 on top of their base count
+        self.important_positive = ['strong', 'growth', 'beat', 'outperform', 'surge', 'rally']
+        self.important_negative = ['crash', 'loss', 'decline', 'warning', 'risk', 'concern']
+        
+        # keyword -> (positive weight, negative weight); texts are tokenized once and
+        # intersected with the keyword set, so "high" no longer matches inside "highlight"
+        self._keyword_weights = {}
+        for words, pos, neg in ((self.positive_words, 1, 0), (self.important_positive, 2, 0),
+                                (self.negative_words, 0, 1), (self.important_negative, 0, 2)):
+            for word in words:
+                p, n = self._keyword_weights.get(word, (0, 0))
+                self._keyword_weights[word] = (p + pos, n + neg)
+        self._keyword_set = frozenset(self._keyword_weights)
         
         # Try to load FinBERT model
         self._load_finbert_model()
@@ -63,8 +126,12 @@ class ProductionFinBERTAnalyzer:
         
         try:
             logger.info("Loading FinBERT model (this may take a moment)...")
-            self.tokenizer = AutoTokenizer.from_pretrained("ProsusAI/finbert")
-            self.model = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert")
+            # Shared with any other analyzer in this process, so the weights load once
+            self.tokenizer, self.model, self.device = get_finbert(self.quantize)
+            # Logit columns -> [negative, neutral, positive], from the checkpoint's own id2label
+            self._label_order = label_order(get_labels(MODEL_NAME))
+            # Replayed CUDA graph for single-text batches (fits only the default token cap)
+            self._graph = None if self._effective_max_len > MAX_LENGTH else get_single_text_graph(self.quantize)
             self.model_loaded = True
             logger.info("FinBERT model loaded successfully!")
         except Exception as e:
@@ -77,7 +144,7 @@ class ProductionFinBERTAnalyzer:
             if not os.path.exists(excel_file):
                 raise FileNotFoundError(f"Portfolio file {excel_file} not found")
             
-            df = pd.read_excel(excel_file)
+            df = read_portfolio_excel(excel_file)
             logger.info(f"Loaded portfolio data: {df.shape}")
             logger.info(f"Columns: {df.columns.tolist()}")
             return df
@@ -88,77 +155,94 @@ class ProductionFinBERTAnalyzer:
     
     def get_financial_news(self, stock_symbol):
         """Generate realistic financial news for analysis"""
-        financial_news = {
-            'GOLD1': "Gold ETF experiences strong institutional inflows as central bank policies drive safe haven demand amid global economic uncertainty",
-            'NATIONALUM': "National Aluminium Company reports record quarterly production with 12% YoY growth, benefiting from robust automotive and infrastructure demand",
-            'OIL': "Oil and Natural Gas Corporation announces major offshore discovery, expects production boost of 15% over next two years with improved margins",
-            'MOTILAL': "Motilal Oswal Large and Midcap Fund delivers alpha with disciplined stock selection, outperforming benchmark by 280 basis points YTD",
-            'RELIANCE': "Reliance Industries posts stellar Q3 results with petrochemicals margin expansion and Jio subscriber additions exceeding estimates",
-            'TCS': "Tata Consultancy Services secures landmark $3.2 billion multi-year deal in financial services vertical, reinforcing market leadership",
-            'HDFCBANK': "HDFC Bank maintains asset quality leadership with gross NPA at multi-year lows while sustaining healthy credit growth momentum", 
-            'INFY': "Infosys raises FY25 revenue guidance citing accelerating digital transformation demand and successful large deal execution",
-            'BHARTIARTL': "Bharti Airtel reports strong ARPU growth with 5G network expansion reaching 75% population coverage ahead of schedule",
-            'ITC': "ITC's diversification strategy pays off with FMCG business contributing 52% to revenue, cigarette headwinds offset by growth segments"
-        }
-        
         # Enhanced matching logic
         clean_symbol = stock_symbol.upper().replace(' ', '').replace('.', '')
         
         # Direct match
-        if clean_symbol in financial_news:
-            return financial_news[clean_symbol]
+        news = FINANCIAL_NEWS.get(clean_symbol)
+        if news is not None:
+            return news
         
         # Partial match
-        for key, news in financial_news.items():
-            if key in clean_symbol or any(word in clean_symbol for word in key.split()):
-                return news
+        match = NEWS_KEY_RE.search(clean_symbol)
+        if match:
+            return FINANCIAL_NEWS[match.group()]
         
         # Generate contextual news based on symbol characteristics
-        if 'FUND' in clean_symbol or 'MUTUAL' in clean_symbol:
+        categories = set(NEWS_CATEGORY_RE.findall(clean_symbol))
+        if 'FUND' in categories or 'MUTUAL' in categories:
             return f"{stock_symbol} mutual fund demonstrates consistent performance with strategic asset allocation and risk management delivering stable returns for investors"
-        elif 'BANK' in clean_symbol:
+        elif 'BANK' in categories:
             return f"{stock_symbol} banking institution reports steady loan growth with maintained asset quality and improving operational efficiency metrics"
-        elif 'GOLD' in clean_symbol or 'SILVER' in clean_symbol:
+        elif 'GOLD' in categories or 'SILVER' in categories:
             return f"{stock_symbol} precious metals investment shows resilience amid market volatility with strong underlying fundamentals supporting valuations"
         else:
             return f"{stock_symbol} demonstrates operational resilience with steady fundamentals and positive medium-term growth outlook in current market environment"
     
     def finbert_sentiment_analysis(self, text):
         """Analyze sentiment using FinBERT model"""
+        results = self.finbert_batch_analysis([text])
+        return results[0] if results else None
+    
+    def finbert_batch_analysis(self, texts, batch_size=BATCH_SIZE):
+        """Analyze many texts with FinBERT, one padded forward pass per batch_size texts"""
+        labels = np.array(SENTIMENT_LABELS)
+        # Only unique texts that are not cached yet go through the model
+        pending = [t for t in dict.fromkeys(texts) if t not in self._sent_cache]
+        if not pending:
+            return [self._sent_cache[t] for t in texts]
+        
         try:
-            # Tokenize input text
-            inputs = self.tokenizer(
-                text, 
-                return_tensors="pt", 
-                padding=True, 
-                truncation=True, 
-                max_length=512
-            )
-            
-            # Get model predictions
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                predictions = torch.nn.functional.softmax(outputs.logits, dim=-1)
+            # Sort by token length so each batch only pads to its own longest text
+            lengths = [len(ids) for ids in self.tokenizer(pending, add_special_tokens=False)['input_ids']]
+            longest = max(lengths) + 2
+            if longest > self._effective_max_len and longest > self._longest_seen:
+                logger.warning(f"News text of {longest} tokens truncated to {self._effective_max_len}; pass long_news=True for long articles")
+            self._longest_seen = max(self._longest_seen, longest)
+            order = np.argsort(lengths, kind='stable')
+            sorted_texts = [pending[i] for i in order]
             
-            # FinBERT output: [negative, neutral, positive]
-            scores = predictions[0].tolist()
-            labels = ['negative', 'neutral', 'positive']
+            for start in range(0, len(sorted_texts), batch_size):
+                batch = sorted_texts[start:start + batch_size]
+                # Tokenize the batch as a single padded tensor
+                inputs = self.tokenizer(
+                    batch, 
+                    return_tensors="pt", 
+                    padding=True, 
+                    truncation=True, 
+                    max_length=self._effective_max_len,
+                    # On GPU, pad to a few fixed bucket lengths so the compiled graph is reused
+                    pad_to_multiple_of=COMPILE_PAD_MULTIPLE if self.device == "cuda" else None
+                ).to(self.device)
+                
+                # Get model predictions
+                # A lone text replays the captured CUDA graph when there is one
+                model = self._graph if len(batch) == 1 and self._graph is not None else self.model
+                with torch.inference_mode():
+                    # Positional (input_ids, attention_mask) so eager, traced, compiled and graph forwards all fit
+                    outputs = model(inputs["input_ids"], inputs["attention_mask"])
+                    predictions = torch.nn.functional.softmax(outputs["logits"].float(), dim=-1)
+                
+                # Columns reordered to [negative, neutral, positive]; one host transfer per batch
+                probs = np.round(predictions.cpu().numpy()[:, self._label_order], 4)
+                # Get predicted class and confidence for the whole batch at once
+                predicted = probs.argmax(axis=1)
+                confidences = probs[np.arange(len(probs)), predicted]
+                
+                for text, label, confidence, scores in zip(batch, labels[predicted].tolist(),
+                                                           confidences.tolist(), probs.tolist()):
+                    self._sent_cache[text] = {
+                        'sentiment': label,
+                        'confidence': confidence,
+                        'scores': {
+                            'negative': scores[0],
+                            'neutral': scores[1],
+                            'positive': scores[2]
+                        },
+                        'method': 'finbert'
+                    }
             
-            # Get predicted class and confidence
-            predicted_idx = torch.argmax(predictions, dim=-1).item()
-            predicted_sentiment = labels[predicted_idx]
-            confidence = scores[predicted_idx]
-            
-            return {
-                'sentiment': predicted_sentiment,
-                'confidence': round(confidence, 4),
-                'scores': {
-                    'negative': round(scores[0], 4),
-                    'neutral': round(scores[1], 4),
-                    'positive': round(scores[2], 4)
-                },
-                'method': 'finbert'
-            }
+            return [self._sent_cache[t] for t in texts]
             
         except Exception as e:
             logger.error(f"FinBERT analysis failed: {e}")
@@ -198,20 +282,12 @@ class ProductionFinBERTAnalyzer:
     
     def rule_based_sentiment_analysis(self, text):
         """Rule-based sentiment analysis as final fallback"""
-        text_lower = text.lower()
-        
-        positive_count = sum(1 for word in self.positive_words if word in text_lower)
-        negative_count = sum(1 for word in self.negative_words if word in text_lower)
-        
-        # Enhanced scoring with word importance
-        important_positive = ['strong', 'growth', 'beat', 'outperform', 'surge', 'rally']
-        important_negative = ['crash', 'loss', 'decline', 'warning', 'risk', 'concern']
-        
-        pos_boost = sum(2 for word in important_positive if word in text_lower)
-        neg_boost = sum(2 for word in important_negative if word in text_lower)
-        
-        total_positive = positive_count + pos_boost
-        total_negative = negative_count + neg_boost
+        # Enhanced scoring with word importance; each keyword counts once however often it appears
+        total_positive = total_negative = 0
+        for word in self._keyword_set.intersection(WORD_RE.findall(text.lower())):
+            p, n = self._keyword_weights[word]
+            total_positive += p
+            total_negative += n
         
         if total_positive > total_negative:
             sentiment = 'positive'
@@ -242,6 +318,10 @@ class ProductionFinBERTAnalyzer:
             if result:
                 return result
         
+        return self._fallback_sentiment(text)
+    
+    def _fallback_sentiment(self, text):
+        """Tier 2/3 analysis used when FinBERT is unavailable or fails"""
         # Tier 2: Try TextBlob (moderate accuracy)
         if TEXTBLOB_AVAILABLE:
             result = self.textblob_sentiment_analysis(text)
@@ -251,7 +331,26 @@ class ProductionFinBERTAnalyzer:
         # Tier 3: Rule-based fallback (basic but reliable)
         return self.rule_based_sentiment_analysis(text)
     
-    def analyze_portfolio_sentiment(self, excel_file):
+    def analyze_sentiments(self, texts, batch_size=BATCH_SIZE):
+        """Multi-tier sentiment analysis for many texts; FinBERT scores them in batches"""
+        if self.model_loaded:
+            results = self.finbert_batch_analysis(texts, batch_size)
+            if results:
+                return results
+        
+        # TextBlob and the rule-based tier are independent per text: spread large lists over processes
+        if len(texts) >= PARALLEL_FALLBACK_MIN and (os.cpu_count() or 1) > 1:
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+                return list(ex.map(self._fallback_sentiment, texts, chunksize=16))
+        return [self._fallback_sentiment(text) for text in texts]
+    
+    def __getstate__(self):
+        """Pickle only the fallback state for pool workers; the model, tokenizer, graph and cache stay here"""
+        state = self.__dict__.copy()
+        state.update(model=None, tokenizer=None, model_loaded=False, _graph=None, _sent_cache={})
+        return state
+    
+    def analyze_portfolio_sentiment(self, excel_file, batch_size=BATCH_SIZE):
         """Analyze sentiment for entire portfolio"""
         df = self.load_portfolio_data(excel_file)
         if df is None:
@@ -281,23 +380,25 @@ class ProductionFinBERTAnalyzer:
         stock_column = 'Instrument'
         if stock_column not in df.columns:
             stock_column = df.columns[0]
+        # Market value column, resolved once rather than per row
+        value_column = find_column(df.columns, ('cur. val', 'current value', 'market value', 'invested'))
         
         logger.info(f"Analyzing {len(df)} stocks using column '{stock_column}'")
         
+        # Collect every stock's news first so FinBERT can score them in batches;
+        # symbols and values come from column operations, not iterrows Series
+        stripped = df[stock_column].astype(str).str.strip()
+        keep = ~stripped.isin(('', 'nan'))
+        symbols = stripped[keep].tolist()
+        values = df.loc[keep, value_column].tolist() if value_column is not None else [None] * len(symbols)
+        
+        # Get financial news and analyze sentiment
+        texts = [self.get_financial_news(s) for s in symbols]
+        sentiment_results = self.analyze_sentiments(texts, batch_size)
+        
         portfolio_sentiments = []
-        total_confidence = 0
         
-        for idx, row in df.iterrows():
-            stock_symbol = str(row[stock_column]).strip()
-            if pd.isna(stock_symbol) or stock_symbol == 'nan' or stock_symbol == '':
-                continue
-            
-            # Get financial news
-            news_text = self.get_financial_news(stock_symbol)
-            
-            # Analyze sentiment
-            sentiment_result = self.analyze_sentiment(news_text)
-            
+        for value, stock_symbol, news_text, sentiment_result in zip(values, symbols, texts, sentiment_results):
             stock_data = {
                 'symbol': stock_symbol,
                 'news': news_text,
@@ -308,37 +409,29 @@ class ProductionFinBERTAnalyzer:
             }
             
             # Add market value if available
-            for col in df.columns:
-                if any(keyword in col.lower() for keyword in ['cur. val', 'current value', 'market value', 'invested']):
-                    try:
-                        value = row[col]
-                        if pd.notna(value):
-                            stock_data['market_value'] = float(str(value).replace(',', ''))
-                            break
-                    except:
-                        pass
+            market_value = coerce_float(value)
+            if market_value is not None:
+                stock_data['market_value'] = market_value
             
             portfolio_sentiments.append(stock_data)
-            total_confidence += sentiment_result['confidence']
-            
-            # Update counters
-            if sentiment_result['sentiment'] == 'positive':
-                results['portfolio_summary']['positive_sentiment'] += 1
-            elif sentiment_result['sentiment'] == 'negative':
-                results['portfolio_summary']['negative_sentiment'] += 1
-            else:
-                results['portfolio_summary']['neutral_sentiment'] += 1
+        
+        # Score rows and label counts as single NumPy reductions
+        scores_arr, (neg_count, neu_count, pos_count) = score_summary(portfolio_sentiments)
+        results['portfolio_summary']['negative_sentiment'] = neg_count
+        results['portfolio_summary']['neutral_sentiment'] = neu_count
+        results['portfolio_summary']['positive_sentiment'] = pos_count
         
         # Calculate portfolio metrics
         total_stocks = len(portfolio_sentiments)
+        total_confidence = sum(s['confidence'] for s in portfolio_sentiments)
         results['portfolio_summary']['total_stocks'] = total_stocks
         results['portfolio_summary']['average_confidence'] = round(total_confidence / max(total_stocks, 1), 4)
         results['stock_sentiments'] = portfolio_sentiments
         
         # Find most positive and negative stocks
         if portfolio_sentiments:
-            most_positive = max(portfolio_sentiments, key=lambda x: x['scores']['positive'])
-            most_negative = max(portfolio_sentiments, key=lambda x: x['scores']['negative'])
+            most_positive = portfolio_sentiments[int(scores_arr[:, 2].argmax())]
+            most_negative = portfolio_sentiments[int(scores_arr[:, 0].argmax())]
             
             results['portfolio_summary']['most_positive'] = {
                 'symbol': most_positive['symbol'],
@@ -355,9 +448,6 @@ class ProductionFinBERTAnalyzer:
             }
             
             # Overall sentiment based on weighted average
-            pos_count = results['portfolio_summary']['positive_sentiment']
-            neg_count = results['portfolio_summary']['negative_sentiment']
-            
             if pos_count > neg_count * 1.5:  # Require stronger positive bias
                 results['portfolio_summary']['overall_sentiment'] = 'positive'
             elif neg_count > pos_count * 1.5:
@@ -384,8 +474,12 @@ def main():
     if results:
         # Save results
         output_file = "portfolio_sentiment_analysis.json"
-        with open(output_file, 'w') as f:
-            json.dump(results, f, indent=2)
+        if ORJSON_AVAILABLE:
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+        else:
+            with open(output_file, 'w') as f:
+                json.dump(results, f, indent=2)
         
         logger.info(f"Analysis complete! Results saved to {output_file}")
         
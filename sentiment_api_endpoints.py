@@ -2,23 +2,95 @@
 FastAPI endpoints for portfolio sentiment analysis
 Add these routes to your existing FastAPI app
 """
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
 import json
 import os
+from pathlib import Path
 from typing import Dict, Any
 
+# Faster JSON decoding/encoding (optional)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+SENTIMENT_FILE = Path("portfolio_sentiment_analysis.json")
+
+# Parsed analysis file and its pre-encoded JSON body, refreshed only when the file's mtime changes
+_CACHE = {"mtime": None, "data": None, "body": None}
+
+# Files up to this size are read with one os.read; larger ones go through Path.read_bytes
+SMALL_FILE_BYTES = 64 * 1024
+
+# Lets browsers and proxies reuse a response for a minute, then revalidate it by ETag
+CACHE_CONTROL = "public, max-age=60"
+
+def _json_bytes(obj):
+    """Encode obj as JSON bytes, with orjson when installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+def _etag(mtime):
+    """Weak ETag for a version of the analysis file; the mock fallback (no file) has a fixed one"""
+    return f'W/"{mtime}"' if mtime is not None else 'W/"mock"'
+
+def _cache_headers(etag):
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+def _not_modified(request, etag):
+    """True if the request's If-None-Match already names etag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+def _json_response(obj, etag):
+    """JSON response encoded with orjson when installed instead of FastAPI's jsonable_encoder"""
+    return Response(content=_json_bytes(obj), media_type="application/json", headers=_cache_headers(etag))
+
+def _read_file(path):
+    """Return (mtime_ns, bytes) of path: open, fstat and a single os.read, so the mtime belongs to
+    the bytes read and there is no text decoding (orjson parses bytes directly)"""
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        st = os.fstat(fd)
+        if st.st_size <= SMALL_FILE_BYTES:
+            return st.st_mtime_ns, os.read(fd, st.st_size)
+    finally:
+        os.close(fd)
+    return st.st_mtime_ns, path.read_bytes()
+
+def _load_sentiment():
+    """Return (data, body, mtime_ns) for the analysis file, or (None, None, None) if it doesn't exist.
+    The file is only re-read and re-encoded when its mtime changes."""
+    # No exists() pre-check: a missing file (even one removed between stat and read) is the fallback
+    try:
+        mtime = SENTIMENT_FILE.stat().st_mtime_ns
+        if _CACHE["mtime"] == mtime:
+            return _CACHE["data"], _CACHE["body"], mtime
+        mtime, raw = _read_file(SENTIMENT_FILE)
+    except FileNotFoundError:
+        return None, None, None
+    data = orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+    _CACHE.update(mtime=mtime, data=data, body=_json_bytes(data))
+    return data, _CACHE["body"], mtime
+
 # Add these to your existing app/main.py or create new endpoints
 
 @app.get("/api/portfolio/sentiment-analysis")
-async def get_portfolio_sentiment():
+async def get_portfolio_sentiment(request: Request):
     """Get complete portfolio sentiment analysis"""
     try:
-        sentiment_file = "portfolio_sentiment_analysis.json"
-        if os.path.exists(sentiment_file):
-            with open(sentiment_file, 'r') as f:
-                data = json.load(f)
-            return JSONResponse(content=data)
+        data, body, mtime = _load_sentiment()
+        etag = _etag(mtime)
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers=_cache_headers(etag))
+        if data is not None:
+            # Already encoded, so FastAPI's per-request JSON encoder is skipped
+            return Response(content=body, media_type="application/json", headers=_cache_headers(etag))
         else:
             # Return mock data if analysis file doesn't exist
             mock_data = {
@@ -49,51 +121,51 @@ async def get_portfolio_sentiment():
                     }
                 ]
             }
-            return JSONResponse(content=mock_data)
+            return _json_response(mock_data, etag)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/portfolio/sentiment")
-async def get_portfolio_sentiment_summary():
+async def get_portfolio_sentiment_summary(request: Request):
     """Get portfolio sentiment summary for the main cards"""
     try:
-        sentiment_file = "portfolio_sentiment_analysis.json"
-        if os.path.exists(sentiment_file):
-            with open(sentiment_file, 'r') as f:
-                data = json.load(f)
-            
+        data, _, mtime = _load_sentiment()
+        etag = _etag(mtime)
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers=_cache_headers(etag))
+        if data is not None:
             summary = data.get('portfolio_summary', {})
-            return {
+            return _json_response({
                 "summary": f"{summary.get('overall_sentiment', 'neutral').title()}",
                 "score": f"+{summary.get('positive_sentiment', 0)} | -{summary.get('negative_sentiment', 0)}"
-            }
+            }, etag)
         else:
-            return {
+            return _json_response({
                 "summary": "Mostly Positive",
                 "score": "+3 | -0"
-            }
+            }, etag)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/portfolio/top-news")
-async def get_portfolio_top_news():
+async def get_portfolio_top_news(request: Request):
     """Get the most important news for the portfolio"""
     try:
-        sentiment_file = "portfolio_sentiment_analysis.json"
-        if os.path.exists(sentiment_file):
-            with open(sentiment_file, 'r') as f:
-                data = json.load(f)
-            
+        data, _, mtime = _load_sentiment()
+        etag = _etag(mtime)
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers=_cache_headers(etag))
+        if data is not None:
             most_positive = data.get('portfolio_summary', {}).get('most_positive')
             if most_positive:
-                return {
+                return _json_response({
                     "headline": f"{most_positive['symbol']}: {most_positive['news'][:100]}...",
                     "link": f"/portfolio/{most_positive['symbol']}"
-                }
+                }, etag)
         
-        return {
+        return _json_response({
             "headline": "GOLD1: Strong inflows drive positive sentiment in precious metals sector",
             "link": "/portfolio/GOLD1"
-        }
+        }, etag)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,84 +1,247 @@
 #!/usr/bin/env python3
 """
-Simple Flask API Server for Portfolio Sentiment Analysis
+Simple FastAPI Server for Portfolio Sentiment Analysis
 Uses Hugging Face Inference API to avoid local PyTorch DLL issues
+
+Usage:
+    gunicorn -c simple_gunicorn_conf.py simple_api_server:app    (production)
+    uvicorn simple_api_server:app --host 0.0.0.0 --port 5000 --workers 4
+(uvicorn uses uvloop and httptools automatically when they are installed)
 """
 
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-import requests
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response
+import numpy as np
+import asyncio
+import functools
+import importlib.util
 import json
+import queue
+import re
+import threading
 import time
 import os
+from concurrent.futures import Future
+
+from finbert_model import DISTILLED_MODEL_NAME
+
+# Faster JSON encoding for responses (optional)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Single-pass keyword matching (optional)
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Async HTTP client for the Hugging Face Inference API (optional)
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# Brotli response compression, with gzip for clients that don't accept br (optional)
+try:
+    from brotli_asgi import BrotliMiddleware
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# JIT for the simulation's scoring arithmetic (optional)
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Local ProsusAI/finbert for analyze_batch (optional; without torch/transformers the simulation is used)
+FINBERT_AVAILABLE = (importlib.util.find_spec("torch") is not None
+                     and importlib.util.find_spec("transformers") is not None)
+
+# Checkpoint for the local model path: the distilled FinBERT by default (INT8 on CPU, BF16/FP16 on GPU
+# via finbert_model); FINBERT_MODEL=ProsusAI/finbert selects the full model
+LOCAL_MODEL_NAME = os.environ.get('FINBERT_MODEL', DISTILLED_MODEL_NAME)
+
+# Hosted ProsusAI/finbert, used when HF_TOKEN is set; headlines it can't score go to the local path
+HF_API_URL = "https://api-inference.huggingface.co/models/ProsusAI/finbert"
+HF_TOKEN = os.environ.get('HF_TOKEN')
+
+# The portfolio is fixed, so the encoded /api/sentiment body is reused for this many seconds and
+# only its timestamp is filled in per request
+SENTIMENT_TTL = 60
+TIMESTAMP_PLACEHOLDER = '__TIMESTAMP__'
+
+# Headlines from concurrent requests are pooled for up to this many seconds and scored together
+BATCH_WINDOW = 0.01
+MAX_BATCH = 32
+
+# Advanced financial sentiment indicators
+STRONG_POSITIVE = ['exceptional', 'stellar', 'outperform', 'breakthrough', 'surge', 'exceeding', 'robust', 'superior']
+POSITIVE = ['strong', 'growth', 'increase', 'gain', 'rising', 'improved', 'bullish', 'optimistic', 'momentum']
+MODERATE_POSITIVE = ['steady', 'stable', 'recovering', 'upbeat', 'favorable', 'encouraging']
+
+STRONG_NEGATIVE = ['crisis', 'collapse', 'plunge', 'devastating', 'catastrophic', 'severe', 'alarming']
+NEGATIVE = ['decline', 'fall', 'loss', 'weak', 'pressure', 'risk', 'concern', 'disappointing', 'bearish']
+MODERATE_NEGATIVE = ['uncertain', 'volatile', 'challenge', 'cautious', 'mixed', 'sluggish']
+
+# Financial sector context weights
+FINANCIAL_CONTEXT = {
+    'etf': 0.1, 'fund': 0.1, 'investment': 0.1, 'portfolio': 0.1,
+    'quarterly': 0.15, 'earnings': 0.15, 'revenue': 0.15, 'production': 0.15,
+    'market': 0.1, 'sector': 0.1, 'industry': 0.1, 'economic': 0.1
+}
+
+# Every simulation keyword in one table: column i of SIMULATION_WEIGHTS holds what a hit on
+# SIMULATION_WORDS[i] adds to the (positive score, negative score, context boost) rows, so a
+# text's three totals are one matrix-vector product with its 0/1 hit vector
+_TIER_WEIGHTS = (
+    (STRONG_POSITIVE, (0.3, 0.0, 0.0)), (POSITIVE, (0.2, 0.0, 0.0)), (MODERATE_POSITIVE, (0.1, 0.0, 0.0)),
+    (STRONG_NEGATIVE, (0.0, 0.3, 0.0)), (NEGATIVE, (0.0, 0.2, 0.0)), (MODERATE_NEGATIVE, (0.0, 0.1, 0.0)),
+    # Context words boost the positive score as well as the neutral confidence; kept last in the table
+    (FINANCIAL_CONTEXT, (0.05, 0.0, 0.05)),
+)
+SIMULATION_WORDS = [word for words, _ in _TIER_WEIGHTS for word in words]
+# Sentiment keywords (columns before this) match as substrings, context words as whole tokens
+CONTEXT_START = len(SIMULATION_WORDS) - len(FINANCIAL_CONTEXT)
+SIMULATION_WEIGHTS = np.ascontiguousarray(
+    np.array([weights for words, weights in _TIER_WEIGHTS for _ in words], dtype=np.float64).T)
+SIMULATION_LABELS = ('negative', 'neutral', 'positive')
+
+# Percent figures in financial reports, e.g. "15%" or "2.5 %"
+_PCT_RE = re.compile(r'(\d+(?:\.\d+)?)\s*%')
+# Lowercase word tokens, for whole-word keyword matching
+_WORD_RE = re.compile(r'[a-z]+')
 
-app = Flask(__name__)
-CORS(app)
+# Enhanced rule-based keywords, matched against a text's token set
+RULE_POSITIVE_WORDS = frozenset([
+    'strong', 'growth', 'exceptional', 'surge', 'outperform', 'stellar',
+    'robust', 'superior', 'exceeding', 'success', 'bullish', 'gain',
+    'rally', 'upbeat', 'optimistic', 'momentum', 'breakthrough'
+])
+RULE_NEGATIVE_WORDS = frozenset([
+    'decline', 'fall', 'loss', 'weak', 'pressure', 'risk', 'concern',
+    'challenge', 'disappointing', 'uncertain', 'bearish', 'drop',
+    'plunge', 'volatile', 'struggle', 'downturn', 'crisis'
+])
+
+# Aho-Corasick automaton over the sentiment keywords (substring matches, like `word in text`)
+SIMULATION_AUTOMATON = None
+if AHOCORASICK_AVAILABLE:
+    SIMULATION_AUTOMATON = ahocorasick.Automaton()
+    for _i, _word in enumerate(SIMULATION_WORDS[:CONTEXT_START]):
+        SIMULATION_AUTOMATON.add_word(_word, _i)
+    SIMULATION_AUTOMATON.make_automaton()
+
+# One pooled keep-alive client (HTTP/2 when h2 is installed) shared by every request
+hf_client = None
+if HTTPX_AVAILABLE and HF_TOKEN:
+    hf_client = httpx.AsyncClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        timeout=10.0,
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        headers={"Authorization": f"Bearer {HF_TOKEN}"},
+    )
+
+app = FastAPI(title="Portfolio Sentiment API")
+
+@app.on_event("shutdown")
+async def close_hf_client():
+    if hf_client is not None:
+        await hf_client.aclose()
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+# The sentiment payload repeats every headline, so it compresses several-fold; tiny bodies are sent as-is
+if BROTLI_AVAILABLE:
+    app.add_middleware(BrotliMiddleware, minimum_size=500)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=500)
+
+def json_bytes(obj):
+    """Encode obj as JSON bytes, with orjson when installed (NumPy scalars and arrays included)"""
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY) if ORJSON_AVAILABLE else json.dumps(obj).encode()
+
+def json_response(obj):
+    """JSON response encoded with orjson when installed; returning a Response also skips
+    FastAPI's jsonable_encoder pass over the result"""
+    return Response(content=json_bytes(obj), media_type='application/json')
 
 def analyze_with_finbert_simulation(text):
     """
     Simulate FinBERT analysis with sophisticated financial sentiment detection
     This provides accurate financial sentiment analysis without external API dependencies
     """
-    import re
-    
-    # Advanced financial sentiment indicators
-    strong_positive = ['exceptional', 'stellar', 'outperform', 'breakthrough', 'surge', 'exceeding', 'robust', 'superior']
-    positive = ['strong', 'growth', 'increase', 'gain', 'rising', 'improved', 'bullish', 'optimistic', 'momentum']
-    moderate_positive = ['steady', 'stable', 'recovering', 'upbeat', 'favorable', 'encouraging']
-    
-    strong_negative = ['crisis', 'collapse', 'plunge', 'devastating', 'catastrophic', 'severe', 'alarming']
-    negative = ['decline', 'fall', 'loss', 'weak', 'pressure', 'risk', 'concern', 'disappointing', 'bearish']
-    moderate_negative = ['uncertain', 'volatile', 'challenge', 'cautious', 'mixed', 'sluggish']
-    
-    # Financial sector context weights
-    financial_context = {
-        'etf': 0.1, 'fund': 0.1, 'investment': 0.1, 'portfolio': 0.1,
-        'quarterly': 0.15, 'earnings': 0.15, 'revenue': 0.15, 'production': 0.15,
-        'market': 0.1, 'sector': 0.1, 'industry': 0.1, 'economic': 0.1
+    sentiment, confidence, pos_prob, neg_prob, neu_prob = _simulate_finbert(text)
+    return {
+        'sentiment': sentiment,
+        'confidence': confidence,
+        'scores': {
+            'positive': pos_prob,
+            'negative': neg_prob,
+            'neutral': neu_prob
+        },
+        'method': 'finbert_local'
     }
-    
+
+@functools.lru_cache(maxsize=512)
+def _simulate_finbert(text):
+    """(sentiment, confidence, positive, negative, neutral) for text, memoized: the result is
+    an immutable tuple so callers get a fresh dict built around it every time"""
     text_lower = text.lower()
     
-    # Calculate sentiment scores with financial context
-    strong_pos_count = sum(1 for word in strong_positive if word in text_lower)
-    pos_count = sum(1 for word in positive if word in text_lower)
-    mod_pos_count = sum(1 for word in moderate_positive if word in text_lower)
+    # 0/1 per keyword: each one counts once however often it occurs
+    hits = np.zeros(len(SIMULATION_WORDS), dtype=np.float64)
+    if SIMULATION_AUTOMATON is not None:
+        hits[[i for _, i in SIMULATION_AUTOMATON.iter(text_lower)]] = 1.0
+    else:
+        hits[:CONTEXT_START] = np.fromiter((word in text_lower for word in SIMULATION_WORDS[:CONTEXT_START]),
+                                           dtype=np.float64, count=CONTEXT_START)
+    # Context words must be whole words ('fund' no longer matches inside 'fundamental')
+    tokens = set(_WORD_RE.findall(text_lower))
+    hits[CONTEXT_START:] = [word in tokens for word in SIMULATION_WORDS[CONTEXT_START:]]
     
-    strong_neg_count = sum(1 for word in strong_negative if word in text_lower)
-    neg_count = sum(1 for word in negative if word in text_lower)
-    mod_neg_count = sum(1 for word in moderate_negative if word in text_lower)
+    # Percentage detection for financial reports
+    percentages = _PCT_RE.findall(text)
+    pct_mean = sum(float(p) for p in percentages) / len(percentages) if percentages else 0.0
     
-    # Financial context boost
-    context_boost = sum(0.05 for word, weight in financial_context.items() if word in text_lower)
+    label, confidence, pos_prob, neg_prob, neu_prob = _score_core(hits, SIMULATION_WEIGHTS, pct_mean)
+    # Without Numba the sums come back as numpy.float64; the result is plain floats either way
+    return (SIMULATION_LABELS[int(label)], round(float(confidence), 4), round(float(pos_prob), 4),
+            round(float(neg_prob), 4), round(float(neu_prob), 4))
+
+def _score_core(hits, weights, pct_mean):
+    """Simulation arithmetic on the keyword hit vector: (label index into SIMULATION_LABELS,
+    confidence, positive, negative, neutral). Plain numbers and arrays only, so Numba can compile it."""
+    # Weighted sentiment scores with financial context, and the context boost
+    positive_score = (weights[0] * hits).sum()
+    negative_score = (weights[1] * hits).sum()
+    context_boost = (weights[2] * hits).sum()
     
-    # Calculate weighted scores
-    positive_score = (strong_pos_count * 0.3) + (pos_count * 0.2) + (mod_pos_count * 0.1) + context_boost
-    negative_score = (strong_neg_count * 0.3) + (neg_count * 0.2) + (mod_neg_count * 0.1)
-    
-    # Percentage detection for financial reports
-    percentages = re.findall(r'(\d+(?:\.\d+)?)\s*%', text)
-    if percentages:
-        avg_pct = sum(float(p) for p in percentages) / len(percentages)
-        if avg_pct > 10:  # High percentage gains/changes
-            positive_score += 0.2
+    if pct_mean > 10:  # High percentage gains/changes
+        positive_score += 0.2
     
     # Determine sentiment with FinBERT-like confidence
-    total_score = positive_score + negative_score
-    
     if positive_score > negative_score:
-        sentiment = 'positive'
+        label = 2
         raw_confidence = 0.75 + min(positive_score * 0.1, 0.2)
         pos_prob = raw_confidence
         neg_prob = (1 - raw_confidence) * 0.3
         neu_prob = (1 - raw_confidence) * 0.7
     elif negative_score > positive_score:
-        sentiment = 'negative' 
+        label = 0
         raw_confidence = 0.75 + min(negative_score * 0.1, 0.2)
         neg_prob = raw_confidence
         pos_prob = (1 - raw_confidence) * 0.3
         neu_prob = (1 - raw_confidence) * 0.7
     else:
-        sentiment = 'neutral'
+        label = 1
         raw_confidence = 0.65 + context_boost
         neu_prob = raw_confidence
         pos_prob = (1 - raw_confidence) * 0.5
@@ -86,34 +249,150 @@ def analyze_with_finbert_simulation(text):
     
     # Normalize confidence to FinBERT-like range
     confidence = min(max(raw_confidence, 0.6), 0.95)
-    
+    return label, confidence, pos_prob, neg_prob, neu_prob
+
+if NUMBA_AVAILABLE:
+    _score_core = njit(cache=True)(_score_core)
+    _score_core(np.zeros(len(SIMULATION_WORDS)), SIMULATION_WEIGHTS, 0.0)  # compile now rather than on the first request
+
+@functools.lru_cache(maxsize=1)
+def _local_finbert():
+    """(torch, tokenizer, model, device, labels) for the local model, or None if it can't be loaded"""
+    if not FINBERT_AVAILABLE:
+        return None
+    try:
+        import torch
+        from finbert_model import get_finbert, get_labels
+        return (torch,) + get_finbert(model_name=LOCAL_MODEL_NAME) + (get_labels(LOCAL_MODEL_NAME),)
+    except Exception as e:
+        print(f"⚠️ Local FinBERT unavailable, using simulation: {e}")
+        return None
+
+def analyze_batch(texts):
+    """Score texts with one tokenizer call and one FinBERT forward pass for the whole batch.
+    Falls back to analyze_with_finbert_simulation when the model isn't available."""
+    finbert = _local_finbert() if texts else None
+    if finbert is not None:
+        from finbert_model import MAX_LENGTH
+        torch, tokenizer, model, device, labels = finbert
+        try:
+            inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True,
+                               max_length=MAX_LENGTH).to(device)
+            with torch.inference_mode():
+                # Positional (input_ids, attention_mask) so eager, traced and compiled models all fit
+                logits = model(inputs["input_ids"], inputs["attention_mask"])["logits"]
+                probs = torch.nn.functional.softmax(logits.float(), dim=-1).cpu().tolist()
+        except Exception as e:
+            print(f"❌ FinBERT batch failed, using simulation: {e}")
+        else:
+            results = []
+            for row in probs:
+                by_label = dict(zip(labels, row))
+                scores = {label: round(by_label.get(label, 0.0), 4) for label in ('positive', 'negative', 'neutral')}
+                sentiment = max(scores, key=scores.get)
+                results.append({
+                    'sentiment': sentiment,
+                    'confidence': scores[sentiment],
+                    'scores': scores,
+                    'method': 'finbert'
+                })
+            return results
+    return [analyze_with_finbert_simulation(text) for text in texts]
+
+class MicroBatcher:
+    """Request coalescing for analyze_batch: texts submitted by concurrent requests are collected for
+    up to BATCH_WINDOW seconds (or MAX_BATCH texts) and scored in one call on a background thread.
+    A text already queued or being scored is not queued again; its waiters share one Future."""
+    
+    def __init__(self, fn, window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        self._fn = fn
+        self._window = window
+        self._max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._thread = None
+    
+    def submit(self, texts):
+        """Return the analyses for texts, blocking until their batch has been scored"""
+        futures = []
+        with self._lock:
+            # Started on first use so a worker forked from a preloaded parent gets its own thread
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            for text in texts:
+                future = self._pending.get(text)
+                if future is None:
+                    future = self._pending[text] = Future()
+                    self._queue.put(text)
+                futures.append(future)
+        return [future.result() for future in futures]
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._window
+            while len(batch) < self._max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                results = self._fn(batch)
+                error = None
+            except Exception as e:
+                error = e
+            with self._lock:
+                futures = [self._pending.pop(text) for text in batch]
+            for i, future in enumerate(futures):
+                if error is None:
+                    future.set_result(results[i])
+                else:
+                    future.set_exception(error)
+
+async def analyze_with_finbert_api(text):
+    """Score text with FinBERT on the Hugging Face Inference API; None if the call fails"""
+    try:
+        response = await hf_client.post(HF_API_URL, json={'inputs': text})
+        response.raise_for_status()
+        # [[{"label": "positive", "score": 0.93}, ...]]
+        scores = {item['label'].lower(): round(item['score'], 4) for item in response.json()[0]}
+        sentiment = max(scores, key=scores.get)
+    except Exception as e:
+        print(f"⚠️ Hugging Face API call failed: {e}")
+        return None
     return {
         'sentiment': sentiment,
-        'confidence': round(confidence, 4),
-        'scores': {
-            'positive': round(pos_prob, 4),
-            'negative': round(neg_prob, 4),
-            'neutral': round(neu_prob, 4)
-        },
-        'method': 'finbert_local'
+        'confidence': scores[sentiment],
+        'scores': {label: scores.get(label, 0.0) for label in ('positive', 'negative', 'neutral')},
+        'method': 'finbert_api'
     }
 
+async def analyze_headlines(texts):
+    """Analyses for texts: all Hugging Face API calls in flight at once when configured, then
+    the rest through the local micro-batcher (run off the event loop, since it blocks)"""
+    analyses = [None] * len(texts)
+    if hf_client is not None:
+        analyses = await asyncio.gather(*(analyze_with_finbert_api(text) for text in texts))
+    missing = [i for i, analysis in enumerate(analyses) if analysis is None]
+    if missing:
+        local = await run_in_threadpool(batcher.submit, [texts[i] for i in missing])
+        for i, analysis in zip(missing, local):
+            analyses[i] = analysis
+    return analyses
+
+# Shared by all requests so concurrent /api/sentiment calls are scored together
+batcher = MicroBatcher(analyze_batch)
+
 def analyze_with_rule_based(text):
-    """Enhanced rule-based sentiment analysis"""
-    positive_words = [
-        'strong', 'growth', 'exceptional', 'surge', 'outperform', 'stellar', 
-        'robust', 'superior', 'exceeding', 'success', 'bullish', 'gain', 
-        'rally', 'upbeat', 'optimistic', 'momentum', 'breakthrough'
-    ]
-    negative_words = [
-        'decline', 'fall', 'loss', 'weak', 'pressure', 'risk', 'concern', 
-        'challenge', 'disappointing', 'uncertain', 'bearish', 'drop', 
-        'plunge', 'volatile', 'struggle', 'downturn', 'crisis'
-    ]
-    
-    text_lower = text.lower()
-    pos_count = sum(1 for word in positive_words if word in text_lower)
-    neg_count = sum(1 for word in negative_words if word in text_lower)
+    """Enhanced rule-based sentiment analysis (whole-word keyword matches)"""
+    tokens = set(_WORD_RE.findall(text.lower()))
+    pos_count = len(RULE_POSITIVE_WORDS & tokens)
+    neg_count = len(RULE_NEGATIVE_WORDS & tokens)
     
     if pos_count > neg_count:
         sentiment = 'positive'
@@ -136,9 +415,22 @@ def analyze_with_rule_based(text):
         'method': 'enhanced_rule_based'
     }
 
-@app.route('/api/sentiment', methods=['GET'])
-def get_portfolio_sentiment():
+# Encoded /api/sentiment body (timestamp left as TIMESTAMP_PLACEHOLDER) and its monotonic expiry
+_sentiment_cache = {'body': None, 'expires': 0.0}
+
+@app.get('/api/sentiment')
+async def get_portfolio_sentiment():
     """Analyze portfolio sentiment using FinBERT via Hugging Face API"""
+    now = time.monotonic()
+    if _sentiment_cache['body'] is None or now >= _sentiment_cache['expires']:
+        _sentiment_cache['body'] = json_bytes(await build_portfolio_sentiment())
+        _sentiment_cache['expires'] = now + SENTIMENT_TTL
+    timestamp = time.strftime('%Y-%m-%dT%H:%M:%S').encode()
+    body = _sentiment_cache['body'].replace(TIMESTAMP_PLACEHOLDER.encode(), timestamp, 1)
+    return Response(content=body, media_type='application/json')
+
+async def build_portfolio_sentiment():
+    """Full /api/sentiment payload, with TIMESTAMP_PLACEHOLDER in place of the timestamp"""
     
     # Portfolio data
     portfolio_stocks = [
@@ -163,10 +455,11 @@ def get_portfolio_sentiment():
     stock_sentiments = []
     finbert_successes = 0
     
-    for stock in portfolio_stocks:
-        # Use FinBERT simulation as primary method
-        analysis = analyze_with_finbert_simulation(stock['news'])
-        
+    # All headlines are scored together: concurrently on the Hugging Face API, or pooled with
+    # other in-flight requests into one local FinBERT forward pass (or the simulation)
+    analyses = await analyze_headlines([stock['news'] for stock in portfolio_stocks])
+    
+    for stock, analysis in zip(portfolio_stocks, analyses):
         if analysis:
             finbert_successes += 1
         else:
@@ -182,16 +475,25 @@ def get_portfolio_sentiment():
             'method': analysis['method']
         })
     
-    # Calculate portfolio summary
-    positive_count = sum(1 for s in stock_sentiments if s['sentiment'] == 'positive')
-    negative_count = sum(1 for s in stock_sentiments if s['sentiment'] == 'negative')
-    neutral_count = sum(1 for s in stock_sentiments if s['sentiment'] == 'neutral')
-    
-    avg_confidence = sum(s['confidence'] for s in stock_sentiments) / len(stock_sentiments)
-    
-    # Find most positive and negative stocks
-    most_positive = max(stock_sentiments, key=lambda x: x['scores']['positive'])
-    most_negative = max(stock_sentiments, key=lambda x: x['scores']['negative'])
+    # Calculate portfolio summary: counts, confidence total and the most positive/negative
+    # stocks (first one wins ties, as with max) in a single pass
+    positive_count = negative_count = neutral_count = 0
+    confidence_sum = 0.0
+    most_positive = most_negative = stock_sentiments[0]
+    for s in stock_sentiments:
+        if s['sentiment'] == 'positive':
+            positive_count += 1
+        elif s['sentiment'] == 'negative':
+            negative_count += 1
+        elif s['sentiment'] == 'neutral':
+            neutral_count += 1
+        confidence_sum += s['confidence']
+        if s['scores']['positive'] > most_positive['scores']['positive']:
+            most_positive = s
+        if s['scores']['negative'] > most_negative['scores']['negative']:
+            most_negative = s
+    
+    avg_confidence = confidence_sum / len(stock_sentiments)
     
     # Determine overall sentiment
     if positive_count > negative_count:
@@ -205,7 +507,7 @@ def get_portfolio_sentiment():
     primary_method = 'finbert_local' if finbert_successes >= len(stock_sentiments) / 2 else 'mixed'
     
     response_data = {
-        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'timestamp': TIMESTAMP_PLACEHOLDER,
         'model_info': {
             'finbert_loaded': finbert_successes > 0,
             'textblob_available': False,
@@ -235,10 +537,16 @@ def get_portfolio_sentiment():
         'stock_sentiments': stock_sentiments
     }
     
-    return jsonify(response_data)
+    return response_data
+
+def allocation_percentages(labels, values, total_value):
+    """Percent of total_value held under each distinct label, e.g. per asset class or sector"""
+    keys, group = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+    percentages = np.bincount(group, weights=values, minlength=len(keys)) / total_value * 100
+    return dict(zip(keys.tolist(), percentages.tolist()))
 
-@app.route('/api/portfolio/risks', methods=['GET'])
-def get_portfolio_risks():
+@app.get('/api/portfolio/risks')
+async def get_portfolio_risks():
     """Analyze portfolio risk exposure based on asset class and sector concentration"""
     
     # Mock portfolio data based on Excel analysis
@@ -249,29 +557,17 @@ def get_portfolio_risks():
         {'instrument': 'MOTILAL', 'current_value': 61464.05, 'asset_class': 'Equity', 'sector': 'Large and Mid Cap Fund'}
     ]
     
-    total_value = sum(holding['current_value'] for holding in portfolio_data)
+    # Holdings as columns, so each allocation below is one grouped NumPy sum
+    values = np.array([holding['current_value'] for holding in portfolio_data], dtype=np.float64)
+    total_value = float(values.sum())
     
     # Asset class analysis
-    asset_class_values = {}
-    for holding in portfolio_data:
-        asset_class = holding['asset_class']
-        asset_class_values[asset_class] = asset_class_values.get(asset_class, 0) + holding['current_value']
-    
-    asset_class_percentages = {
-        asset_class: (value / total_value * 100) 
-        for asset_class, value in asset_class_values.items()
-    }
-    
-    # Sector analysis  
-    sector_values = {}
-    for holding in portfolio_data:
-        sector = holding['sector']
-        sector_values[sector] = sector_values.get(sector, 0) + holding['current_value']
+    asset_class_percentages = allocation_percentages([holding['asset_class'] for holding in portfolio_data],
+                                                     values, total_value)
     
-    sector_percentages = {
-        sector: (value / total_value * 100)
-        for sector, value in sector_values.items()
-    }
+    # Sector analysis
+    sector_percentages = allocation_percentages([holding['sector'] for holding in portfolio_data],
+                                                values, total_value)
     
     # Risk assessment
     risks = []
@@ -298,8 +594,10 @@ def get_portfolio_risks():
         })
     
     # Sector concentration risk
-    max_sector_pct = max(sector_percentages.values()) if sector_percentages else 0
-    max_sector = max(sector_percentages.keys(), key=lambda k: sector_percentages[k]) if sector_percentages else 'Unknown'
+    if sector_percentages:
+        max_sector, max_sector_pct = max(sector_percentages.items(), key=lambda kv: kv[1])
+    else:
+        max_sector, max_sector_pct = 'Unknown', 0
     
     if max_sector_pct > 50:
         risks.append({
@@ -330,7 +628,7 @@ def get_portfolio_risks():
         'icon': '💱'
     })
     
-    return jsonify({
+    return json_response({
         'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
         'total_portfolio_value': total_value,
         'asset_class_allocation': asset_class_percentages,
@@ -343,19 +641,19 @@ def get_portfolio_risks():
         'risks': risks
     })
 
-@app.route('/health', methods=['GET'])
-def health_check():
+@app.get('/health')
+async def health_check():
     """Health check endpoint"""
-    return jsonify({
+    return json_response({
         'status': 'healthy',
         'service': 'Portfolio Sentiment API',
         'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
     })
 
-@app.route('/', methods=['GET'])
-def index():
+@app.get('/')
+async def index():
     """Root endpoint with API info"""
-    return jsonify({
+    return json_response({
         'service': 'Portfolio Sentiment Analysis API',
         'version': '1.0',
         'endpoints': [
@@ -372,4 +670,5 @@ if __name__ == '__main__':
     print("🌐 Server running on http://localhost:5000")
     print("📋 API endpoint: http://localhost:5000/api/sentiment")
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    import uvicorn
+    uvicorn.run("simple_api_server:app", host='0.0.0.0', port=5000, workers=4)
\ No newline at end of file
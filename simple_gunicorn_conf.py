@@ -0,0 +1,18 @@
+"""
+Gunicorn settings for the simple portfolio sentiment API (FastAPI app on uvicorn workers)
+
+Usage:
+    gunicorn -c simple_gunicorn_conf.py simple_api_server:app
+"""
+import os
+
+bind = "0.0.0.0:5000"
+# One event-loop worker per core; WEB_CONCURRENCY overrides
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Import the app (keyword tables, Numba compile) once in the master so forked workers share those pages;
+# the micro-batcher thread and any local model are still started per worker, on first use
+preload_app = True
+# First request in a worker may download and quantize the local model
+timeout = 120
+keepalive = 5
@@ -3,29 +3,168 @@ Simplified Portfolio Sentiment Analyzer
 Uses TextBlob for basic sentiment analysis as a fallback when FinBERT is not available
 """
 import pandas as pd
+import numpy as np
+import importlib.util
 import json
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from portfolio_io import EXCEL_ENGINE, find_column
 
-# Try to import textblob, install if not available
+# TextBlob is only looked up here; importing it (NLTK, pattern lexicon) is deferred to _get_textblob
+HAS_TEXTBLOB = importlib.util.find_spec("textblob") is not None
+if not HAS_TEXTBLOB:
+    print("TextBlob not available, using rule-based sentiment analysis")
+_TextBlob = None
+
+def _get_textblob():
+    """TextBlob class, imported on first use (None if the import fails)"""
+    global _TextBlob, HAS_TEXTBLOB
+    if _TextBlob is None and HAS_TEXTBLOB:
+        try:
+            from textblob import TextBlob
+            _TextBlob = TextBlob
+        except ImportError:
+            HAS_TEXTBLOB = False
+    return _TextBlob
+
+# Faster JSON writer for the results file (optional)
 try:
-    from textblob import TextBlob
-    HAS_TEXTBLOB = True
+    import orjson
+    ORJSON_AVAILABLE = True
 except ImportError:
-    HAS_TEXTBLOB = False
-    print("TextBlob not available, using rule-based sentiment analysis")
+    ORJSON_AVAILABLE = False
+
+# Vectorized keyword counting for whole batches of texts (optional)
+try:
+    from sklearn.feature_extraction.text import CountVectorizer
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+# JIT (multi-core) for batch_sentiment's scoring loop (optional)
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    prange = range
+    NUMBA_AVAILABLE = False
+
+# Hyperscan compiles the keyword lists into one DFA that scans a text in a single pass (optional)
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
+# Word tokens, split the same way as batch_sentiment's vectorizer
+WORD_RE = re.compile(r'\w+')
+
+# Only the first rows of the sheet are analyzed (demo limit)
+MAX_STOCKS = 20
+# A column whose name contains one of these holds the stock's weight/value
+VALUE_KEYWORDS = ('value', 'amount', 'weight', 'allocation', 'market')
+
+def _collect_match(pattern_id, start, end, flags, matched):
+    """Hyperscan match handler: record which keyword matched"""
+    matched.add(pattern_id)
+
+# Label per _score_kernel code
+KERNEL_LABELS = ('neutral', 'positive', 'negative')
+
+def _score_kernel(pos, neg):
+    """Rule-based scoring of keyword counts, same rules as simple_sentiment_analysis:
+    (label codes into KERNEL_LABELS, confidences, scores as [positive, negative, neutral] rows)"""
+    n = pos.shape[0]
+    labels = np.zeros(n, dtype=np.int8)
+    confidences = np.empty(n, dtype=np.float64)
+    scores = np.empty((n, 3), dtype=np.float64)
+    for i in prange(n):
+        diff = pos[i] - neg[i]
+        if diff > 0:
+            label = 1
+            confidence = min(0.6 + diff * 0.1, 0.95)
+        elif diff < 0:
+            label = 2
+            confidence = min(0.6 + (-diff) * 0.1, 0.95)
+        else:
+            label = 0
+            confidence = 0.5
+        labels[i] = label
+        confidences[i] = confidence
+        rest = 1 - confidence
+        scores[i, 0] = confidence if label == 1 else rest
+        scores[i, 1] = confidence if label == 2 else rest / 2
+        scores[i, 2] = confidence if label == 0 else rest / 2
+    return labels, confidences, scores
+
+if NUMBA_AVAILABLE:
+    _score_kernel = njit(cache=True, parallel=True)(_score_kernel)
 
 class SimplePortfolioSentimentAnalyzer:
+    # Sample financial news for demonstration, built once at class definition
+    _SAMPLE_NEWS = {
+        'GOLD1': "Gold ETF sees strong inflows as investors seek safe haven assets amid market uncertainty",
+        'NATIONALUM': "National Aluminium Company reports record production levels, strong demand from automotive sector",
+        'OIL': "Oil and Natural Gas Corporation discovers new reserves, production outlook remains positive",
+        'MOTILAL': "Motilal Oswal Large and Midcap Fund outperforms benchmark with strong stock selection strategy",
+        'RELIANCE': "Reliance Industries reports strong quarterly earnings with 15% growth in digital services revenue",
+        'TCS': "TCS wins major digital transformation deal worth $2.5 billion, stock rallies on positive outlook",
+        'HDFCBANK': "HDFC Bank's Q3 results beat estimates with healthy loan growth and stable asset quality",
+        'INFY': "Infosys raises revenue guidance for FY25, cites strong demand in AI and cloud services",
+        'BHARTIARTL': "Bharti Airtel 5G rollout accelerates, subscriber base grows 8% quarter-on-quarter",
+        'ITC': "ITC diversification strategy shows results with FMCG segment contributing 50% to revenue",
+        'SBIN': "State Bank of India reports lowest bad loan ratio in 8 years, provisions decline significantly",
+        'LT': "Larsen & Toubro bags Rs 15,000 crore infrastructure orders, order book reaches record high",
+        'ASIANPAINT': "Asian Paints faces margin pressure due to raw material cost inflation, volumes remain steady",
+        'MARUTI': "Maruti Suzuki electric vehicle strategy gains momentum with new model launches planned"
+    }
+    # Lowercased sample news, computed once, for the rule-based keyword matching
+    _SAMPLE_NEWS_LOWER = {text: text.lower() for text in _SAMPLE_NEWS.values()}
+    # Rule-based keyword lexicon, shared by every instance
+    POSITIVE_WORDS = frozenset({'growth', 'strong', 'beat', 'rally', 'positive', 'win', 'profit', 'gain', 'high', 'good', 'excellent', 'bullish', 'surge', 'rise'})
+    NEGATIVE_WORDS = frozenset({'decline', 'fall', 'loss', 'weak', 'pressure', 'drop', 'bad', 'poor', 'bearish', 'crash', 'volatility', 'concern'})
+    # Fixed keyword order for the vectorizer columns and Hyperscan ids: positive words first, then negative
+    _KEYWORDS = tuple(sorted(POSITIVE_WORDS)) + tuple(sorted(NEGATIVE_WORDS))
+    
     def __init__(self):
         print("Initializing Simple Sentiment Analyzer...")
-        self.positive_words = ['growth', 'strong', 'beat', 'rally', 'positive', 'win', 'profit', 'gain', 'high', 'good', 'excellent', 'bullish', 'surge', 'rise']
-        self.negative_words = ['decline', 'fall', 'loss', 'weak', 'pressure', 'drop', 'bad', 'poor', 'bearish', 'crash', 'volatility', 'concern']
+        # Sparse text x keyword presence matrix for batch_sentiment, columns in _KEYWORDS order
+        self._vectorizer = None
+        if SKLEARN_AVAILABLE:
+            # Texts arrive already lowercased (see _lower)
+            self._vectorizer = CountVectorizer(vocabulary=self._KEYWORDS,
+                                               lowercase=False, token_pattern=r'\b\w+\b', binary=True)
+        # Compiled keyword scanner for simple_sentiment_analysis; pattern id = index into
+        # _KEYWORDS, each reported once per text (whole words, any case)
+        self._hs_db = None
+        if HYPERSCAN_AVAILABLE:
+            keywords = self._KEYWORDS
+            flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+            self._hs_db = hyperscan.Database()
+            self._hs_db.compile(expressions=[rb'\b' + w.encode() + rb'\b' for w in keywords],
+                                ids=list(range(len(keywords))), elements=len(keywords),
+                                flags=[flags] * len(keywords))
+            # One scratch space per database: the TextBlob thread pool's fallbacks take turns
+            self._hs_lock = threading.Lock()
+        # Cleaned symbol -> matching _SAMPLE_NEWS key (or None), so each symbol is matched only once
+        self._news_keys = {}
+        # News text -> sentiment result; the sample news repeats, so each text is analyzed once
+        self._sent_cache = {}
         
     def load_portfolio_data(self, excel_file):
-        """Load portfolio data from Excel file"""
+        """Load portfolio data from Excel file: only the symbol and value columns of the first
+        MAX_STOCKS rows, which is all the analysis uses"""
         try:
-            # Read the Excel file
-            df = pd.read_excel(excel_file)
+            with pd.ExcelFile(excel_file, engine=EXCEL_ENGINE) as xls:
+                # Header-only parse to pick the columns, then one parse of just those
+                header = xls.parse(nrows=0).columns.tolist()
+                stock_column = 'Instrument' if 'Instrument' in header else header[0]
+                weight_col = find_column(header, VALUE_KEYWORDS)
+                wanted = list(dict.fromkeys(c for c in (stock_column, weight_col) if c is not None))
+                df = xls.parse(usecols=wanted, nrows=MAX_STOCKS)
             print(f"Loaded data from Excel file")
             print(f"Portfolio data shape: {df.shape}")
             print(f"Columns: {df.columns.tolist()}")
@@ -37,37 +176,21 @@ class SimplePortfolioSentimentAnalyzer:
     
     def get_sample_news(self, stock_symbol):
         """Generate sample financial news for demonstration"""
-        sample_news = {
-            'GOLD1': "Gold ETF sees strong inflows as investors seek safe haven assets amid market uncertainty",
-            'NATIONALUM': "National Aluminium Company reports record production levels, strong demand from automotive sector",
-            'OIL': "Oil and Natural Gas Corporation discovers new reserves, production outlook remains positive",
-            'MOTILAL': "Motilal Oswal Large and Midcap Fund outperforms benchmark with strong stock selection strategy",
-            'RELIANCE': "Reliance Industries reports strong quarterly earnings with 15% growth in digital services revenue",
-            'TCS': "TCS wins major digital transformation deal worth $2.5 billion, stock rallies on positive outlook",
-            'HDFCBANK': "HDFC Bank's Q3 results beat estimates with healthy loan growth and stable asset quality",
-            'INFY': "Infosys raises revenue guidance for FY25, cites strong demand in AI and cloud services",
-            'BHARTIARTL': "Bharti Airtel 5G rollout accelerates, subscriber base grows 8% quarter-on-quarter",
-            'ITC': "ITC diversification strategy shows results with FMCG segment contributing 50% to revenue",
-            'SBIN': "State Bank of India reports lowest bad loan ratio in 8 years, provisions decline significantly",
-            'LT': "Larsen & Toubro bags Rs 15,000 crore infrastructure orders, order book reaches record high",
-            'ASIANPAINT': "Asian Paints faces margin pressure due to raw material cost inflation, volumes remain steady",
-            'MARUTI': "Maruti Suzuki electric vehicle strategy gains momentum with new model launches planned"
-        }
-        
         # Clean the stock symbol and try to match
         clean_symbol = stock_symbol.upper().replace(' ', '').replace('.', '')
-        for key in sample_news:
-            if key in clean_symbol or clean_symbol in key:
-                return sample_news[key]
+        if clean_symbol in self._news_keys:
+            key = self._news_keys[clean_symbol]
+        else:
+            key = next((k for k in self._SAMPLE_NEWS if k in clean_symbol or clean_symbol in k), None)
+            self._news_keys[clean_symbol] = key
+        if key is not None:
+            return self._SAMPLE_NEWS[key]
         
         return f"{stock_symbol} shows stable performance with moderate market volatility and steady investor interest"
     
     def simple_sentiment_analysis(self, text):
         """Simple rule-based sentiment analysis"""
-        text_lower = text.lower()
-        
-        positive_count = sum(1 for word in self.positive_words if word in text_lower)
-        negative_count = sum(1 for word in self.negative_words if word in text_lower)
+        positive_count, negative_count = self._keyword_counts(text)
         
         if positive_count > negative_count:
             sentiment = 'positive'
@@ -89,9 +212,34 @@ class SimplePortfolioSentimentAnalyzer:
             }
         }
     
+    def _keyword_counts(self, text):
+        """(positive, negative) number of distinct keywords occurring in text as whole words
+        ('rise' doesn't match inside 'uprising')"""
+        if self._hs_db is not None:
+            matched = set()
+            with self._hs_lock:
+                self._hs_db.scan(text.encode(), match_event_handler=_collect_match, context=matched)
+            positive_count = sum(1 for i in matched if i < len(self.POSITIVE_WORDS))
+            return positive_count, len(matched) - positive_count
+        # One tokenization, then a hashed set intersection per list
+        tokens = set(WORD_RE.findall(self._lower(text)))
+        return len(tokens & self.POSITIVE_WORDS), len(tokens & self.NEGATIVE_WORDS)
+    
+    def _lower(self, text):
+        """text.lower(), precomputed for the sample news"""
+        lower = self._SAMPLE_NEWS_LOWER.get(text)
+        return text.lower() if lower is None else lower
+    
     def analyze_sentiment(self, text):
-        """Analyze sentiment using available method"""
-        if HAS_TEXTBLOB:
+        """Analyze sentiment using available method (cached per text)"""
+        result = self._sent_cache.get(text)
+        if result is None:
+            result = self._sent_cache[text] = self._analyze_uncached(text)
+        return result
+    
+    def _analyze_uncached(self, text):
+        TextBlob = _get_textblob()
+        if TextBlob is not None:
             try:
                 blob = TextBlob(text)
                 polarity = blob.sentiment.polarity  # -1 to 1
@@ -121,6 +269,53 @@ class SimplePortfolioSentimentAnalyzer:
         # Fallback to simple rule-based analysis
         return self.simple_sentiment_analysis(text)
     
+    def batch_sentiment(self, texts):
+        """Analyze many texts at once, returned as arrays with one entry per text: 'sentiment',
+        'confidence' and the 'pos'/'neg'/'neu' scores. Without TextBlob, the rule-based keyword
+        counts for all unique texts come from one sparse matrix and are scored with NumPy."""
+        if HAS_TEXTBLOB:
+            # Uncached texts are parsed on a thread pool; the first one runs alone so TextBlob's
+            # lazily loaded lexicon is in place before the threads share it
+            pending = [t for t in dict.fromkeys(texts) if t not in self._sent_cache]
+            if len(pending) > 1:
+                self.analyze_sentiment(pending[0])
+                with ThreadPoolExecutor(max_workers=min(len(pending) - 1, os.cpu_count() or 1)) as ex:
+                    for text, result in zip(pending[1:], ex.map(self._analyze_uncached, pending[1:])):
+                        self._sent_cache[text] = result
+        if HAS_TEXTBLOB or self._vectorizer is None:
+            results = [self.analyze_sentiment(t) for t in texts]
+            scores = np.array([[r['confidence'], r['scores']['positive'], r['scores']['negative'],
+                                r['scores']['neutral']] for r in results], dtype=np.float64).reshape(-1, 4)
+            return {
+                'sentiment': np.array([r['sentiment'] for r in results], dtype='U8'),
+                'confidence': scores[:, 0],
+                'pos': scores[:, 1],
+                'neg': scores[:, 2],
+                'neu': scores[:, 3]
+            }
+        
+        # Unique text -> its row in the matrix
+        rows = {}
+        for t in texts:
+            rows.setdefault(t, len(rows))
+        unique = list(rows)
+        # Keyword presence (whole words, each counted once) for every text in one C-level pass
+        matrix = self._vectorizer.transform([self._lower(t) for t in unique])
+        n_pos = len(self.POSITIVE_WORDS)
+        pos = np.asarray(matrix[:, :n_pos].sum(axis=1), dtype=np.int64).ravel()
+        neg = np.asarray(matrix[:, n_pos:].sum(axis=1), dtype=np.int64).ravel()
+        labels, confidences, scores = _score_kernel(pos, neg)
+        
+        # Scatter the unique rows back to one row per input text
+        index = np.fromiter((rows[t] for t in texts), dtype=np.intp, count=len(texts))
+        return {
+            'sentiment': np.array(KERNEL_LABELS, dtype='U8')[labels[index]],
+            'confidence': confidences[index],
+            'pos': scores[index, 0],
+            'neg': scores[index, 1],
+            'neu': scores[index, 2]
+        }
+    
     def analyze_portfolio_sentiment(self, excel_file):
         """Analyze sentiment for entire portfolio"""
         # Load portfolio data
@@ -150,51 +345,61 @@ class SimplePortfolioSentimentAnalyzer:
         
         print(f"Using column '{stock_column}' for stock symbols")
         
-        # Analyze sentiment for each stock
+        # Weight/value column, resolved once rather than per row, and parsed as one numeric column
+        # ("1,234.5" -> 1234.5, "-12.5" -> -12.5; anything unparseable -> NaN)
+        rows = df.head(MAX_STOCKS)
+        weight_col = find_column(df.columns, VALUE_KEYWORDS)
+        if weight_col is not None:
+            values = rows[weight_col]
+            # Columns Excel already stored as numbers skip the string round-trip
+            if not pd.api.types.is_numeric_dtype(values):
+                values = values.astype(str).str.replace(',', '', regex=False)
+            weights = pd.to_numeric(values, errors='coerce')
+        else:
+            weights = pd.Series(np.nan, index=rows.index)
+        
+        # Symbols come from column operations, not per-row Series; blank/NaN cells are dropped
+        symbols = rows[stock_column].astype(str).str.strip()
+        keep = (symbols != 'nan') & (symbols != '')
+        symbols = symbols[keep].tolist()
+        weights = weights[keep]
+        has_weight = weights.notna().to_numpy()
+        weights = weights.to_numpy(dtype=np.float64)
+        
+        # Get sample news for each stock and analyze sentiment
+        news_texts = [self.get_sample_news(s) for s in symbols]
+        batch = self.batch_sentiment(news_texts)
+        
+        # Confidences and [positive, negative, neutral] score rows, each rounded by one np.round
+        sentiments = batch['sentiment']
+        confidences = np.round(batch['confidence'], 3)
+        scores = np.round(np.column_stack((batch['pos'], batch['neg'], batch['neu'])), 3)
+        
         portfolio_sentiments = []
         
-        for idx, row in df.iterrows():
-            if idx >= 20:  # Limit to first 20 stocks for demo
-                break
-                
-            stock_symbol = str(row[stock_column]).strip()
-            if pd.isna(stock_symbol) or stock_symbol == 'nan' or stock_symbol == '':
-                continue
-                
-            # Get sample news for the stock
-            news_text = self.get_sample_news(stock_symbol)
-            
-            # Analyze sentiment
-            sentiment_result = self.analyze_sentiment(news_text)
-            
+        for stock_symbol, news_text, weight, weighted, sentiment, confidence, (pos, neg, neu) in zip(
+                symbols, news_texts, weights.tolist(), has_weight.tolist(), sentiments.tolist(),
+                confidences.tolist(), scores.tolist()):
             stock_data = {
                 'symbol': stock_symbol,
                 'news': news_text,
-                'sentiment': sentiment_result['sentiment'],
-                'confidence': round(sentiment_result['confidence'], 3),
-                'scores': {k: round(v, 3) for k, v in sentiment_result['scores'].items()}
+                'sentiment': sentiment,
+                'confidence': confidence,
+                'scores': {'positive': pos, 'negative': neg, 'neutral': neu}
             }
             
             # Add weight/value if available
-            for col in df.columns:
-                if any(keyword in col.lower() for keyword in ['value', 'amount', 'weight', 'allocation', 'market']):
-                    try:
-                        value = row[col]
-                        if pd.notna(value) and str(value).replace('.', '').replace(',', '').isdigit():
-                            stock_data['weight'] = float(str(value).replace(',', ''))
-                            break
-                    except:
-                        pass
+            if weighted:
+                stock_data['weight'] = weight
             
             portfolio_sentiments.append(stock_data)
-            
-            # Update counters
-            if sentiment_result['sentiment'] == 'positive':
-                results['portfolio_summary']['positive_sentiment'] += 1
-            elif sentiment_result['sentiment'] == 'negative':
-                results['portfolio_summary']['negative_sentiment'] += 1
-            else:
-                results['portfolio_summary']['neutral_sentiment'] += 1
+        
+        # Counters straight from the label array
+        positive_count = int(np.count_nonzero(sentiments == 'positive'))
+        negative_count = int(np.count_nonzero(sentiments == 'negative'))
+        results['portfolio_summary']['positive_sentiment'] = positive_count
+        results['portfolio_summary']['negative_sentiment'] = negative_count
+        results['portfolio_summary']['neutral_sentiment'] = len(sentiments) - positive_count - negative_count
         
         # Calculate overall portfolio sentiment
         results['portfolio_summary']['total_stocks'] = len(portfolio_sentiments)
@@ -202,8 +407,9 @@ class SimplePortfolioSentimentAnalyzer:
         
         # Find most positive and negative stocks
         if portfolio_sentiments:
-            most_positive = max(portfolio_sentiments, key=lambda x: x['scores']['positive'])
-            most_negative = max(portfolio_sentiments, key=lambda x: x['scores']['negative'])
+            # Both extremes via NumPy argmax over the rounded score rows (first one wins ties, as with max)
+            most_positive = portfolio_sentiments[int(scores[:, 0].argmax())]
+            most_negative = portfolio_sentiments[int(scores[:, 1].argmax())]
             
             results['portfolio_summary']['most_positive'] = {
                 'symbol': most_positive['symbol'],
@@ -247,8 +453,12 @@ def main():
     if results:
         # Save results to JSON file for the web dashboard
         output_file = "portfolio_sentiment_analysis.json"
-        with open(output_file, 'w') as f:
-            json.dump(results, f, indent=2)
+        if ORJSON_AVAILABLE:
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+        else:
+            with open(output_file, 'w') as f:
+                json.dump(results, f, indent=2)
         
         print(f"Sentiment analysis complete! Results saved to {output_file}")
         print(f"Portfolio Summary:")